@@ -2,65 +2,120 @@ import sys
 import os
 import re  # 添加正则表达式支持，用于公式解析
 import json  # 导入json模块用于条件组的导入导出
-import pandas as pd
-import openpyxl
-import shutil
 import traceback
+import bisect
 import importlib
 import importlib.util
+import importlib.metadata
 import subprocess  # 添加subprocess模块用于安装依赖
-from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-    QLabel, QPushButton, QLineEdit, QListWidget, QFileDialog, 
-    QMessageBox, QGroupBox, QCheckBox, QTabWidget, QProgressBar,
-    QScrollArea, QFrame, QSizePolicy, QSplitter, QTableWidget,
-    QTableWidgetItem, QListWidgetItem, QGridLayout
-)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
 
+# 匹配Excel单元格引用的正则表达式，形式如A1, $A$1, A1:B2, Sheet1!A1, 'Sheet with spaces'!$A$1等
+# 一次匹配即可得到工作表前缀(prefix)、列引用(col)、行的$符号(abs)和行号(row)，区域引用的终点为col2/abs2/row2
+_CELL_RE = re.compile(r'(?P<prefix>(?:[\'"]?[\w\s]+[\'"]?)?!|)(?P<col>\$?[A-Z]+)(?P<abs>\$?)(?P<row>\d+)'
+                      r'(?::(?P<col2>\$?[A-Z]+)(?P<abs2>\$?)(?P<row2>\d+))?')
+
+# 跨工作表引用（如Sheet1!A1、'Sheet 1'!$A$1:B2）的正则表达式
+# 带引号的工作表名中单引号写作''，不带引号的工作表名只能由字母、数字、下划线和点组成
+# 引用其他工作簿时工作表名前带有[1]形式的前缀(book)，这类引用与本工作簿的行映射无关
+_SHEET_REF_RE = re.compile(r"(?P<book>\[[^\]]+\])?(?P<sheet>'(?:[^']|'')+'|[^\W\d][\w.]*)!"
+                           r'(?P<col>\$?[A-Z]+)(?P<abs>\$?)(?P<row>\d+)'
+                           r'(?::(?P<col2>\$?[A-Z]+)(?P<abs2>\$?)(?P<row2>\d+))?')
+
+# openpyxl在keep_vba模式下保存时原样写回的部件（VBA工程、窗体控件、旧式绘图等）
+_VBA_PART_RE = re.compile(r'xl/vba|xl/drawings/.*vmlDrawing\d\.vml|xl/ctrlProps|customUI|xl/activeX|xl/media/.*\.emf')
+
+# 文件名字符转换表：字母、数字（含中文等Unicode字符）、空格、下划线和连字符保留，其余替换为下划线
+# 字符集不固定，首次遇到某个字符时计算并缓存结果，之后由str.translate在C层直接查表
+class _SafeNameTable(dict):
+    def __missing__(self, code):
+        char = chr(code)
+        result = char if char.isalnum() or char in ' _-' else '_'
+        self[code] = result
+        return result
+
+_SAFE_NAME_TABLE = _SafeNameTable()
+
+# 删除行后的行号映射，只保存被删除的行号，按需用二分查找计算新行号
+class RowMapping:
+    def __init__(self, deleted_rows, max_row):
+        self.deleted_set = set(deleted_rows)
+        self.sorted_deleted = sorted(self.deleted_set)
+        self.max_row = max_row  # 原工作表的最大行号，超出范围的行不做映射
+        # 第一个被删除的行号，在它之前的行号不受影响
+        self.first_deleted = self.sorted_deleted[0] if self.sorted_deleted else max_row + 1
+    
+    def new_row_for(self, orig_row):
+        """返回原行号对应的新行号，被删除的行返回None"""
+        if orig_row in self.deleted_set:
+            return None
+        return orig_row - bisect.bisect_right(self.sorted_deleted, orig_row)
+    
+    def get(self, orig_row, default=None):
+        if not 1 <= orig_row <= self.max_row:
+            return default
+        if orig_row < self.first_deleted:
+            return orig_row
+        return self.new_row_for(orig_row)
+    
+    def __contains__(self, orig_row):
+        return 1 <= orig_row <= self.max_row
+    
+    def __getitem__(self, orig_row):
+        if orig_row not in self:
+            raise KeyError(orig_row)
+        return self.new_row_for(orig_row)
+    
+    def __bool__(self):
+        return bool(self.sorted_deleted)
+
 # 公式处理助手类
 class FormulaHelper:
     @staticmethod
-    def create_row_mapping(worksheet):
-        """创建原始行号到行内容的映射"""
-        row_content_map = {}
-        for row_idx, row in enumerate(worksheet.iter_rows(min_row=1), 1):
-            # 存储该行的所有单元格值作为内容特征
-            row_content = [str(cell.value) if cell.value is not None else "" for cell in row]
-            row_content_map[row_idx] = row_content
-        return row_content_map
+    def _map_row(row, row_mappings):
+        """依次经过各次删除的行映射得到新行号，行被删除时返回None"""
+        for row_mapping in row_mappings:
+            row = row_mapping.get(row)
+            if row is None:
+                return None
+        return row
     
     @staticmethod
-    def build_row_mapping_after_deletion(original_map, deleted_rows):
-        """在删除行后，建立原始行号到新行号的映射关系"""
-        mapping = {}
-        offset = 0
-        
-        for orig_row in sorted(original_map.keys()):
-            if orig_row in deleted_rows:
-                # 该行被删除，映射到None
-                mapping[orig_row] = None
-                offset += 1
-            else:
-                # 该行保留，新行号 = 原行号 - 偏移量
-                mapping[orig_row] = orig_row - offset
-        
-        return mapping
+    def _rewrite_endpoints(match, row_mappings):
+        """改写引用（及区域终点）的行号，删除或未映射的行保持原样"""
+        # 映射到None表示该行已被删除，保持原样（可能导致#REF!错误）
+        row = match.group('row')
+        new_row = FormulaHelper._map_row(int(row), row_mappings)
+        # 绝对引用保留$符号
+        text = f"{match.group('col')}{match.group('abs')}{row if new_row is None else new_row}"
+        
+        row2 = match.group('row2')
+        if row2 is not None:
+            new_row2 = FormulaHelper._map_row(int(row2), row_mappings)
+            text += f":{match.group('col2')}{match.group('abs2')}{row2 if new_row2 is None else new_row2}"
+        return text
     
     @staticmethod
-    def parse_cell_references(formula):
-        """解析公式中的单元格引用"""
-        if not formula or not isinstance(formula, str):
-            return []
-        
-        # 匹配Excel单元格引用的正则表达式模式
-        # 匹配形式如A1, $A$1, Sheet1!A1, 'Sheet with spaces'!$A$1等
-        pattern = r'(?:(?:[\'"]?[\w\s]+[\'"]?)?!)?(\$?[A-Z]+\$?[0-9]+)'
-        
-        # 查找所有匹配项
-        matches = re.findall(pattern, formula)
-        return matches
+    def _rewrite_reference(match, row_mapping):
+        """按行映射改写单个单元格引用，带工作表前缀的引用由跨工作表处理统一改写"""
+        if match.group('prefix'):
+            return match.group(0)
+        return FormulaHelper._rewrite_endpoints(match, (row_mapping,))
+    
+    @staticmethod
+    def _rewrite_sheet_reference(match, sheet_row_mappings):
+        """按被引用工作表的行映射改写跨工作表引用，其他工作簿的引用保持原样"""
+        if match.group('book'):
+            return match.group(0)
+        sheet = match.group('sheet')
+        sheet_name = sheet[1:-1].replace("''", "'") if sheet.startswith("'") else sheet
+        row_mappings = sheet_row_mappings.get(sheet_name)
+        if not row_mappings:
+            return match.group(0)
+        return f"{sheet}!{FormulaHelper._rewrite_endpoints(match, row_mappings)}"
     
     @staticmethod
     def adjust_formula_references(formula, row_mapping):
@@ -68,70 +123,99 @@ class FormulaHelper:
         if not formula or not isinstance(formula, str) or not formula.startswith('='):
             return formula
         
-        # 解析公式中的单元格引用
-        cell_refs = FormulaHelper.parse_cell_references(formula)
+        # 不含数字的公式不可能包含单元格引用
+        if not any(ch.isdigit() for ch in formula):
+            return formula
         
-        # 按长度排序，确保替换最长的引用（避免部分替换导致错误）
-        cell_refs.sort(key=len, reverse=True)
+        # 一次扫描公式，在匹配位置直接改写，避免逐个str.replace造成的部分替换
+        return _CELL_RE.sub(lambda m: FormulaHelper._rewrite_reference(m, row_mapping), formula)
+    
+    @staticmethod
+    def iter_formula_cells(worksheet):
+        """遍历工作表中包含公式的单元格"""
+        # openpyxl把已占用的单元格保存在_cells字典中，直接遍历可跳过空单元格的Cell对象构建
+        cells = getattr(worksheet, '_cells', None)
+        if cells is not None:
+            candidates = list(cells.values())
+        else:
+            candidates = (cell for row in worksheet.iter_rows() for cell in row)
         
-        new_formula = formula
+        for cell in candidates:
+            if cell.data_type == 'f':
+                yield cell
+    
+    @staticmethod
+    def set_formula(cell, formula):
+        """写入已知为公式的新值"""
+        # 直接写入内部值，跳过Cell.value赋值时的数据类型推断
+        if hasattr(cell, '_value'):
+            cell._value = formula
+            cell.data_type = 'f'
+        else:
+            cell.value = formula
+    
+    @staticmethod
+    def update_formulas_in_sheet(worksheet, row_mapping):
+        """更新工作表中所有单元格的公式"""
+        updated_count = 0
         
-        for ref in cell_refs:
-            # 解析列引用和行引用
-            match = re.match(r'(\$?[A-Z]+)(\$?[0-9]+)', ref)
-            if match:
-                col_ref, row_ref = match.groups()
+        # 没有删除任何行时所有引用都不变，无需扫描公式
+        if not row_mapping:
+            return updated_count
+        
+        # 同一工作表中相同的公式（如绝对引用的汇总公式）只改写一次
+        rewritten = {}
+        for cell in FormulaHelper.iter_formula_cells(worksheet):
+            original_formula = cell.value
+            if original_formula and original_formula.__class__ is str:
+                # 调整公式引用
+                new_formula = rewritten.get(original_formula)
+                if new_formula is None:
+                    new_formula = rewritten[original_formula] = \
+                        FormulaHelper.adjust_formula_references(original_formula, row_mapping)
                 
-                # 检查是否包含行号
-                if row_ref.startswith('$'):
-                    # 绝对引用，保留$符号
-                    row_num = int(row_ref[1:])
-                    is_absolute = True
-                else:
-                    # 相对引用
-                    row_num = int(row_ref)
-                    is_absolute = False
-                
-                # 如果行号在映射关系中
-                if row_num in row_mapping:
-                    new_row_num = row_mapping[row_num]
-                    
-                    # 如果映射到None，表示该行已被删除，保持原样（可能导致#REF!错误）
-                    if new_row_num is None:
-                        continue
-                    
-                    # 构建新的行引用
-                    if is_absolute:
-                        new_row_ref = f'${new_row_num}'
-                    else:
-                        new_row_ref = str(new_row_num)
-                    
-                    # 构建新的单元格引用
-                    new_ref = f'{col_ref}{new_row_ref}'
-                    
-                    # 替换公式中的引用
-                    # 需要考虑引用可能前后有特殊字符的情况
-                    new_formula = new_formula.replace(ref, new_ref)
+                # 如果公式有变化，更新单元格
+                if new_formula != original_formula:
+                    FormulaHelper.set_formula(cell, new_formula)
+                    updated_count += 1
         
-        return new_formula
+        return updated_count
     
     @staticmethod
-    def update_formulas_in_sheet(worksheet, row_mapping):
-        """更新工作表中所有单元格的公式"""
+    def update_cross_sheet_formulas(workbook, sheet_row_mappings):
+        """更新所有工作表中引用了被删除行的工作表的公式
+        
+        sheet_row_mappings: {工作表名: [按删除顺序排列的行映射]}
+        """
         updated_count = 0
         
-        for row in worksheet.iter_rows():
-            for cell in row:
-                if cell.data_type == 'f':  # 如果单元格包含公式
-                    original_formula = cell.value
-                    if original_formula and isinstance(original_formula, str):
-                        # 调整公式引用
-                        new_formula = FormulaHelper.adjust_formula_references(original_formula, row_mapping)
-                        
-                        # 如果公式有变化，更新单元格
-                        if new_formula != original_formula:
-                            cell.value = new_formula
-                            updated_count += 1
+        # 只有真正删除过行的工作表需要改写引用，没有时无需扫描
+        sheet_row_mappings = {name: row_mappings for name, row_mappings in sheet_row_mappings.items()
+                              if any(row_mappings)}
+        if not sheet_row_mappings:
+            return updated_count
+        # 公式中工作表名里的单引号写作''，按公式中的写法预先筛选
+        mapped_names = [name.replace("'", "''") for name in sheet_row_mappings]
+        
+        repl = lambda m: FormulaHelper._rewrite_sheet_reference(m, sheet_row_mappings)
+        rewritten = {}  # 相同的公式只改写一次
+        for worksheet in workbook.worksheets:
+            for cell in FormulaHelper.iter_formula_cells(worksheet):
+                formula = cell.value
+                # 不含!的公式不可能引用其他工作表，不含任何被删行工作表名称的公式也无需改写
+                if not formula or formula.__class__ is not str or '!' not in formula:
+                    continue
+                if not any(name in formula for name in mapped_names):
+                    continue
+                new_formula = rewritten.get(formula)
+                if new_formula is None:
+                    new_formula = rewritten[formula] = _SHEET_REF_RE.sub(repl, formula)
+                if new_formula != formula:
+                    try:
+                        FormulaHelper.set_formula(cell, new_formula)
+                        updated_count += 1
+                    except Exception as e:
+                        print(f"更新公式时出错: {e} - 原始公式: {formula}, 新公式: {new_formula}")
         
         return updated_count
 
@@ -146,47 +230,28 @@ def install_package(package):
         print(f"安装 {package} 失败: {str(e)}")
         return False
 
-# 首先检查setuptools是否安装
-try:
-    import pkg_resources
-except ImportError:
-    print("正在安装setuptools...")
-    if not install_package("setuptools"):
-        print("无法安装setuptools，程序无法继续。")
-        sys.exit(1)
-    try:
-        import pkg_resources
-    except ImportError:
-        print("setuptools安装后仍无法导入pkg_resources，程序无法继续。")
-        sys.exit(1)
-
-# 检查单个包是否已安装
-def is_package_installed(package_name):
-    try:
-        return importlib.util.find_spec(package_name) is not None
-    except ModuleNotFoundError:
-        return False
-
 # 确保最小依赖项装载正确
 minimal_deps = {
     'PyQt5': ['PyQt5.QtWidgets', 'PyQt5.QtCore'],
     'pandas': ['pandas'],
-    'openpyxl': ['openpyxl']
+    'openpyxl': ['openpyxl'],
+    'lxml': ['lxml']  # openpyxl检测到lxml后自动使用其更快的XML读写
 }
 
-# 初始化一个空的字典来存储未安装的依赖
-missing_pkgs = {}
+def find_missing_packages():
+    """返回未安装的依赖，所有依赖都能直接导入时跳过逐个查找"""
+    try:
+        import PyQt5.QtWidgets, PyQt5.QtCore, pandas, openpyxl, lxml
+        return {}
+    except ImportError:
+        pass
+    
+    # 一次遍历已安装的发行包，而不是为每个模块分别查找sys.path
+    installed = {(dist.metadata['Name'] or '').lower() for dist in importlib.metadata.distributions()}
+    return {pkg_name: pkg_name for pkg_name in minimal_deps if pkg_name.lower() not in installed}
 
-# 检查所有依赖
-for pkg_name, modules in minimal_deps.items():
-    missing = False
-    for module in modules:
-        if not is_package_installed(module):
-            missing = True
-            break
-    
-    if missing:
-        missing_pkgs[pkg_name] = pkg_name
+# 存储未安装的依赖
+missing_pkgs = find_missing_packages()
 
 # 如果PyQt5未安装，需要先安装才能显示界面
 if 'PyQt5' in missing_pkgs:
@@ -209,6 +274,7 @@ from PyQt5.QtCore import Qt, QThread, pyqtSignal
 class DependencyInstaller(QThread):
     progress_signal = pyqtSignal(str, int)
     finished_signal = pyqtSignal(bool)
+    PIP_OPTIONS = ["--disable-pip-version-check", "--no-input"]  # 跳过pip版本检查，不等待交互输入
     
     def __init__(self, packages):
         super().__init__()
@@ -216,22 +282,50 @@ class DependencyInstaller(QThread):
         
     def run(self):
         total = len(self.packages)
-        success = True
+        self.progress_signal.emit(f"正在安装 {', '.join(self.packages)}...", 0)
+        
+        # 所有依赖合并为一次pip调用，只启动一次pip并只解析一次依赖
+        command = [sys.executable, "-m", "pip", "install", *self.PIP_OPTIONS, *self.packages]
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       text=True, errors='replace')
+            collected = 0
+            for line in process.stdout:
+                # 根据pip的输出估算进度
+                if line.startswith("Collecting "):
+                    collected += 1
+                    self.progress_signal.emit(line.strip(), min(collected * 80 // total, 80))
+                elif line.startswith("Installing collected packages"):
+                    self.progress_signal.emit(line.strip(), 90)
+            success = process.wait() == 0
+        except Exception as e:
+            print(f"运行pip时出错: {str(e)}")
+            success = False
         
+        if success:
+            for package in self.packages:
+                self.progress_signal.emit(f"{package} 安装成功", 100)
+        else:
+            # 合并安装失败时逐个安装，找出无法安装的包
+            success = self.install_one_by_one()
+        
+        self.finished_signal.emit(success)
+    
+    def install_one_by_one(self):
+        """逐个安装依赖，遇到失败的包时停止"""
+        total = len(self.packages)
         for i, package in enumerate(self.packages):
             progress = int((i / total) * 100)
             self.progress_signal.emit(f"正在安装 {package}...", progress)
             
             try:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", package],
+                subprocess.check_call([sys.executable, "-m", "pip", "install", *self.PIP_OPTIONS, package],
                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
                 self.progress_signal.emit(f"{package} 安装成功", progress + 10)
             except:
                 self.progress_signal.emit(f"{package} 安装失败", progress)
-                success = False
-                break
-                
-        self.finished_signal.emit(success)
+                return False
+        return True
 
 class DependencyDialog(QDialog):
     """依赖安装对话框"""
@@ -371,38 +465,834 @@ if not check_dependencies():
     sys.exit(1)
 
 # 现在可以安全地导入其余的模块
-from collections import defaultdict  # 导入defaultdict用于存储跨工作表引用
+import numpy as np
+import pandas as pd
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.xml import LXML
+
+# 没有lxml时openpyxl退回标准库的XML实现，保存文件明显变慢
+if not LXML:
+    print("警告: openpyxl未使用lxml，保存文件会较慢，请安装: pip install lxml")
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+    QLabel, QPushButton, QLineEdit, QListWidget, QFileDialog, 
+    QMessageBox, QGroupBox, QCheckBox, QTabWidget, QProgressBar,
+    QSizePolicy, QSplitter,
+    QGridLayout, QTableView, QListView,
+    QStyledItemDelegate, QStyleOptionButton, QStyle, QHeaderView
+)
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QAbstractTableModel, QAbstractListModel,
+                          QModelIndex, QEvent, QObject, QRunnable, QThreadPool,
+                          QStringListModel, QSortFilterProxyModel, QTimer)
+from collections import OrderedDict  # 导入OrderedDict用于按最近使用顺序淘汰缓存
+
+# orjson为可选依赖，安装后条件组的导入导出速度更快
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# python-calamine为可选依赖，安装后pandas可用Rust实现的calamine引擎读取工作表数据
+try:
+    import python_calamine  # noqa: F401
+    # pandas 2.2起才支持calamine引擎，更早的版本即使安装了python-calamine也不能使用
+    HAS_CALAMINE = tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+except ImportError:
+    HAS_CALAMINE = False
+
+def json_dumps(obj):
+    """将对象序列化为缩进2格、保留中文的JSON文本"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def json_loads(text):
+    """解析JSON文本，格式错误时抛出json.JSONDecodeError"""
+    if orjson is not None:
+        return orjson.loads(text)  # orjson.JSONDecodeError是json.JSONDecodeError的子类
+    return json.loads(text)
+
+# 批处理条件组类，用于存储多sheet并拆的条件
+class ConditionGroup:
+    def __init__(self, name=""):
+        self.name = name if name else "未命名条件组"
+        self.conditions = []  # [{sheet, column, values, _display}]
+    
+    @staticmethod
+    def format_values(values):
+        """生成筛选值在表格中的显示文本"""
+        if len(values) > 3:
+            return f"{values[0]}, {values[1]}, {values[2]}... 等{len(values)}个值"
+        return ", ".join(map(str, values))
+    
+    def add_condition(self, sheet, column, values):
+        """添加一个筛选条件"""
+        self.conditions.append({
+            'sheet': sheet,
+            'column': column,
+            'values': values,
+            '_display': self.format_values(values)  # 预先生成显示文本，表格刷新时直接读取
+        })
+    
+    def remove_condition(self, index):
+        """删除指定索引的筛选条件"""
+        if 0 <= index < len(self.conditions):
+            del self.conditions[index]
+    
+    def clear_conditions(self):
+        """清空所有筛选条件"""
+        self.conditions = []
+    
+    def sheet_filters(self):
+        """按工作表汇总筛选条件 {sheet: [(列名, 筛选值字符串集合)]}
+        
+        同一列的多个条件合并筛选值（满足其一即可），不同列的条件需同时满足
+        """
+        sheet_columns = {}
+        for condition in self.conditions:
+            column_sets = sheet_columns.setdefault(condition['sheet'], {})
+            column_sets.setdefault(condition['column'], set()).update(str(v) for v in condition['values'])
+        return {sheet: list(column_sets.items()) for sheet, column_sets in sheet_columns.items()}
+    
+    def to_dict(self):
+        """转换为可序列化的字典，以下划线开头的键是运行时缓存，不包含在内"""
+        return {
+            'name': self.name,
+            'conditions': [{k: v for k, v in cond.items() if not k.startswith('_')}
+                           for cond in self.conditions]
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict生成的字典重建条件组"""
+        group = cls(data['name'])
+        for cond in data['conditions']:
+            group.add_condition(cond['sheet'], cond['column'], cond['values'])
+        return group
+
+# 条件表格数据模型，视图只在绘制时按需查询可见单元格
+class ConditionTableModel(QAbstractTableModel):
+    HEADERS = ["工作表", "列", "值", "操作"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.group = None  # 当前显示的ConditionGroup
+
+    def set_group(self, group):
+        """切换要显示的条件组"""
+        self.beginResetModel()
+        self.group = group
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.group is None:
+            return 0
+        return len(self.group.conditions)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole or self.group is None:
+            return None
+
+        condition = self.group.conditions[index.row()]
+        column = index.column()
+        if column == 0:
+            return condition['sheet']
+        if column == 1:
+            return condition['column']
+        if column == 2:
+            return condition['_display']
+        return "删除"
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def add_condition(self, sheet, column, values):
+        """在末尾插入一个筛选条件，只通知视图新增的一行"""
+        if self.group is None:
+            return
+        row = len(self.group.conditions)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.group.add_condition(sheet, column, values)
+        self.endInsertRows()
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        """删除连续的若干行筛选条件，只使被删除的行失效"""
+        if self.group is None or parent.isValid() or count <= 0:
+            return False
+        if row < 0 or row + count > len(self.group.conditions):
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        del self.group.conditions[row:row + count]
+        self.endRemoveRows()
+        return True
+    
+    def remove_condition(self, row):
+        """删除指定行的筛选条件"""
+        return self.removeRows(row, 1)
+
+# 可勾选的值列表模型，勾选状态存放在bytearray中，不为每个值创建控件
+class CheckableListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._values = []
+        self._checked = bytearray()
+
+    def set_values(self, values):
+        """替换全部值并清空勾选状态"""
+        self.beginResetModel()
+        self._values = list(values)
+        self._checked = bytearray(len(self._values))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._values)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self._values[index.row()]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self._checked[index.row()] else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        self._checked[index.row()] = 1 if value == Qt.Checked else 0
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def set_rows_checked(self, rows, checked):
+        """一次性勾选或取消指定行，只发出一次数据变化通知"""
+        if not rows:
+            return
+        flag = 1 if checked else 0
+        for row in rows:
+            self._checked[row] = flag
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [Qt.CheckStateRole])
+
+    def checked_values(self):
+        """按列表顺序返回已勾选的值"""
+        return [value for value, flag in zip(self._values, self._checked) if flag]
+
+# 操作列的按钮委托，只绘制按钮外观而不为每行创建QPushButton
+class ButtonDelegate(QStyledItemDelegate):
+    clicked = pyqtSignal(int)  # 被点击的行号
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.State_Enabled
+        QApplication.style().drawControl(QStyle.CE_PushButton, button, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if option.rect.contains(event.pos()):
+                self.clicked.emit(index.row())
+                return True
+        return super().editorEvent(event, model, option, index)
+
+# 单元格和工作表格式复制
+class FormatHelper:
+    @staticmethod
+    def copy_cell_format(source_cell, target_cell):
+        """完整复制单元格格式"""
+        FormatHelper.apply_cell_format(FormatHelper.capture_cell_format(source_cell), target_cell)
+    
+    @staticmethod
+    def capture_cell_format(source_cell):
+        """复制单元格的各个样式对象，结果可以赋给多个单元格，没有样式时返回None"""
+        # 只读模式下的空单元格(EmptyCell)没有样式属性
+        if not getattr(source_cell, 'has_style', False):
+            return None
+        return (copy(source_cell.font), copy(source_cell.border), copy(source_cell.fill),
+                source_cell.number_format, copy(source_cell.protection), copy(source_cell.alignment))
+    
+    @staticmethod
+    def apply_cell_format(cell_format, target_cell):
+        """把capture_cell_format得到的样式赋给单元格，样式对象不可变，多个单元格可以共用"""
+        if cell_format is None:
+            return
+        (target_cell.font, target_cell.border, target_cell.fill,
+         target_cell.number_format, target_cell.protection, target_cell.alignment) = cell_format
+    
+    @staticmethod
+    def copy_sheet_formatting(source_sheet, target_sheet):
+        """复制工作表级别的格式设置"""
+        # 复制列宽
+        for column_letter, column_dim in source_sheet.column_dimensions.items():
+            target_sheet.column_dimensions[column_letter].width = column_dim.width
+        
+        # 复制行高
+        for row_number, row_dim in source_sheet.row_dimensions.items():
+            if row_dim.height is not None:
+                target_sheet.row_dimensions[row_number].height = row_dim.height
+
+# 条件组的实际处理逻辑，不依赖任何界面对象，可以在子进程中运行
+class GroupProcessor:
+    WRITE_CHUNK_ROWS = 10000  # pandas备用方法写入时每次转换为Python对象的行数
+    
+    @staticmethod
+    def header_index(header_values):
+        """返回标题行 {列名文本: 列索引}，列名重复时取第一列"""
+        index = {}
+        for i, value in enumerate(header_values):
+            index.setdefault(str(value), i)
+        return index
+    
+    @staticmethod
+    def has_vba_parts(excel_file):
+        """检查文件中是否有需要keep_vba才能保留的部件，只读取zip目录"""
+        try:
+            with zipfile.ZipFile(excel_file) as archive:
+                return any(_VBA_PART_RE.match(name) for name in archive.namelist())
+        except (zipfile.BadZipFile, OSError):
+            return True  # 无法判断时按原方式保留
+    
+    @staticmethod
+    def load_source_workbook(excel_file):
+        """完整加载源文件用于保留格式的处理，加载文件时的验证使用同样的参数"""
+        # keep_vba会把整个压缩包复制到内存中，只在文件确实包含VBA等部件时才开启
+        keep_vba = GroupProcessor.has_vba_parts(excel_file)
+        return openpyxl.load_workbook(excel_file, keep_vba=keep_vba, data_only=False, keep_links=True)
+    
+    @staticmethod
+    def delete_rows_in_one_pass(ws, rows_to_delete, row_mapping):
+        """一次遍历删除多行，保留的单元格直接移动到新行号"""
+        # 逐行调用delete_rows每次都要移动其下方的所有单元格，删除行数多时为O(行数×删除数)
+        if not hasattr(ws, '_cells'):
+            for row_idx in sorted(rows_to_delete, reverse=True):
+                ws.delete_rows(row_idx, 1)
+            return
+        
+        new_cells = {}
+        for (row, col), cell in ws._cells.items():
+            new_row = row_mapping.get(row, row)
+            if new_row is None:
+                continue  # 被删除的行
+            cell.row = new_row
+            new_cells[(new_row, col)] = cell
+        ws._cells = new_cells
+        ws._current_row = ws.max_row if new_cells else 0
+        
+        # 行高随行一起移动，被删除行的行高丢弃
+        # 数据范围以下的空行也可能设置了行高，同样按其上方删除的行数上移，不受行映射范围限制
+        moved_dims = [(row_mapping.new_row_for(row), dim) for row, dim in ws.row_dimensions.items()]
+        ws.row_dimensions.clear()
+        for new_row, dim in moved_dims:
+            if new_row is not None:
+                dim.index = new_row
+                ws.row_dimensions[new_row] = dim
+        
+        # 合并单元格区域收缩到保留的行上，全部行被删除或只剩一个单元格时取消合并
+        for merged_range in list(ws.merged_cells.ranges):
+            rows = range(merged_range.min_row, merged_range.max_row + 1)
+            kept_rows = [new_row for new_row in map(row_mapping.new_row_for, rows) if new_row is not None]
+            if not kept_rows or (len(kept_rows) == 1 and merged_range.min_col == merged_range.max_col):
+                ws.merged_cells.remove(merged_range)
+            else:
+                merged_range.min_row = kept_rows[0]
+                merged_range.max_row = kept_rows[-1]
+    
+    @staticmethod
+    def process_with_openpyxl(excel_file, condition_group, output_path):
+        """使用openpyxl方法处理条件组"""
+        try:
+            # 直接读取原始文件，处理后另存为新文件，不再先复制一份再重新读取
+            wb = GroupProcessor.load_source_workbook(excel_file)
+            
+            # 存储所有工作表的行映射关系 {工作表名: [行映射]}
+            sheet_row_mappings = {}
+            
+            # wb.sheetnames每次访问都重新生成列表，wb[名称]要逐个比较工作表，先建一次字典
+            worksheets = {ws.title: ws for ws in wb.worksheets}
+            
+            # 按工作表处理筛选条件，每个工作表只收集一次要删除的行
+            for sheet_name, filters in condition_group.sheet_filters().items():
+                ws = worksheets.get(sheet_name)
+                if ws is None:
+                    print(f"警告: 找不到工作表 '{sheet_name}'，跳过此筛选条件")
+                    continue
+                
+                # 查找列索引，只读取标题行的值
+                header_values = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+                header_index = GroupProcessor.header_index(header_values)
+                
+                # 所有筛选列都符合条件的行才保留，只读取筛选列的值
+                sheet_max_row = ws.max_row
+                keep = [True] * max(sheet_max_row - 1, 0)
+                filters_applied = False
+                for column_name, filter_set in filters:
+                    col_index = header_index.get(column_name)
+                    if col_index is None:
+                        print(f"警告: 在工作表 '{sheet_name}' 中找不到列 '{column_name}'，跳过此筛选条件")
+                        continue
+                    col_values = next(ws.iter_cols(min_col=col_index + 1, max_col=col_index + 1,
+                                                   min_row=2, values_only=True), ())
+                    # 用列表推导一次生成新的保留标记，比逐行下标赋值少一半解释器开销
+                    none_kept = "" in filter_set  # 空单元格按空字符串比较
+                    keep = [kept and (none_kept if value is None else str(value) in filter_set)
+                            for kept, value in zip(keep, col_values)]
+                    filters_applied = True
+                
+                if not filters_applied:
+                    continue
+                
+                rows_to_delete = [i + 2 for i, kept in enumerate(keep) if not kept]
+                
+                # 如果所有行都要删除，保留一行数据避免工作表为空
+                if len(rows_to_delete) >= sheet_max_row - 1:
+                    print(f"警告: 工作表 '{sheet_name}' 的筛选条件将删除所有行，保留第一行数据")
+                    if 2 in rows_to_delete:
+                        rows_to_delete.remove(2)
+                
+                # 构建行映射关系，每个工作表只有一次删除
+                row_mapping = RowMapping(rows_to_delete, sheet_max_row)
+                sheet_row_mappings[sheet_name] = [row_mapping]
+                
+                # 删除不符合条件的行
+                GroupProcessor.delete_rows_in_one_pass(ws, rows_to_delete, row_mapping)
+                
+                # 更新公式
+                FormulaHelper.update_formulas_in_sheet(ws, row_mapping)
+            
+            # 处理跨工作表公式引用（包括同一工作表内带工作表名的引用）
+            FormulaHelper.update_cross_sheet_formulas(wb, sheet_row_mappings)
+            
+            # 保存文件
+            wb.save(output_path)
+            wb.close()
+            
+        except PermissionError:
+            raise PermissionError(f"无法写入文件，可能是权限不足或文件被其他程序占用:\n{output_path}")
+    
+    @staticmethod
+    def process_streaming(excel_file, condition_groups, output_paths):
+        """以只读+只写模式流式处理多个条件组，源文件只读取一遍，每一行分发到符合条件的各个输出文件
+        
+        内存占用与行数无关，公式只保留计算结果。返回与output_paths对应的错误信息列表，成功为None
+        """
+        # 每个条件组按工作表汇总筛选条件 {sheet: [(列名, 筛选值集合)]}
+        group_filters = [condition_group.sheet_filters() for condition_group in condition_groups]
+        
+        src_wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=True)
+        dest_wbs = [openpyxl.Workbook(write_only=True) for _ in output_paths]
+        try:
+            for src_ws in src_wb.worksheets:
+                sheet_name = src_ws.title
+                dest_sheets = [dest_wb.create_sheet(sheet_name) for dest_wb in dest_wbs]
+                rows = src_ws.iter_rows()
+                header = next(rows, None)
+                if header is None:
+                    continue
+                
+                # 标题行保留原有样式，样式只复制一次，所有输出文件共用
+                header_formats = [(cell.value, FormatHelper.capture_cell_format(cell)) for cell in header]
+                for dest_ws in dest_sheets:
+                    header_cells = []
+                    for value, cell_format in header_formats:
+                        new_cell = WriteOnlyCell(dest_ws, value=value)
+                        FormatHelper.apply_cell_format(cell_format, new_cell)
+                        header_cells.append(new_cell)
+                    dest_ws.append(header_cells)
+                
+                # 把列名换成列索引，找不到的列跳过
+                header_index = GroupProcessor.header_index(cell.value for cell in header)
+                targets = []  # [(输出工作表, [(列索引, 筛选值集合)])]
+                for dest_ws, sheet_filters in zip(dest_sheets, group_filters):
+                    filters = []
+                    for column_name, filter_set in sheet_filters.get(sheet_name, []):
+                        if column_name in header_index:
+                            filters.append((header_index[column_name], filter_set))
+                        else:
+                            print(f"警告: 在工作表 '{sheet_name}' 中找不到列 '{column_name}'，跳过此筛选条件")
+                    targets.append((dest_ws, filters))
+                
+                for row in src_ws.iter_rows(min_row=2, values_only=True):
+                    row_len = len(row)
+                    for dest_ws, filters in targets:
+                        for col_index, filter_set in filters:
+                            value = row[col_index] if col_index < row_len else None
+                            if (str(value) if value is not None else "") not in filter_set:
+                                break
+                        else:
+                            dest_ws.append(row)
+        finally:
+            src_wb.close()
+        
+        errors = []
+        for dest_wb, output_path in zip(dest_wbs, output_paths):
+            try:
+                dest_wb.save(output_path)
+                errors.append(None)
+            except PermissionError:
+                errors.append(f"无法写入文件，可能是权限不足或文件被其他程序占用:\n{output_path}")
+            except Exception as e:
+                errors.append(str(e))
+        return errors
+    
+    @staticmethod
+    def value_text(value):
+        """返回与openpyxl单元格str(值)一致的文本，含空值的整数列被pandas读成浮点数，仍按整数显示"""
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+    
+    @staticmethod
+    def factorize_as_str(series):
+        """把数据列分解为整数编码和每个编码对应的str(值)文本，空值的编码为-1"""
+        if series.dtype == object:
+            # 对象列中1、1.0和True哈希相同会被合并为一个编码，先逐个转换为文本再分解
+            codes, uniques = pd.factorize(series.astype(str).where(series.notna()))
+            return codes, list(uniques)
+        # 类型单一的列直接分解原始值，只把去重后的值转换为文本
+        codes, uniques = pd.factorize(series)
+        return codes, [GroupProcessor.value_text(value) for value in uniques]
+    
+    @staticmethod
+    def value_mask(series, values):
+        """返回数据列中str(值)属于values的行的布尔数组"""
+        # 只对去重后的值做集合查找，再按整数编码展开到每一行
+        codes, texts = GroupProcessor.factorize_as_str(series)
+        matched = np.array([text in values for text in texts] + [False], dtype=bool)
+        return matched[codes]  # 空值的编码为-1，对应末尾的False
+    
+    @staticmethod
+    def process_with_pandas(df_dict, condition_group, output_path, value_indices=None):
+        """使用pandas方法处理条件组，value_indices为预先按值分组的行号 {(sheet, column): {值: 行号数组}}"""
+        value_indices = value_indices or {}
+        try:
+            # 读取所有工作表
+            all_dfs = {}
+            processed_sheets = []
+            skipped_sheets = []
+            
+            # 按工作表汇总筛选条件 {sheet: [(列名, 筛选值集合)]}，筛选值已转换为字符串
+            sheet_filters = condition_group.sheet_filters()
+            
+            for sheet_name, df in df_dict.items():
+                try:
+                    # 所有条件合并为一个布尔掩码，最后只做一次布尔索引（布尔索引本身会生成副本）
+                    mask = None
+                    # 条件中保存的是列名文本，数字等非字符串列名要映射回原始列名
+                    column_names = dict(zip(df.columns.astype(str), df.columns))
+                    for column, values in sheet_filters.get(sheet_name, []):
+                        if column in column_names:
+                            value_index = value_indices.get((sheet_name, column))
+                            if value_index is not None:
+                                # 按预先分组好的行号直接标记命中的行，不再扫描整列
+                                column_mask = np.zeros(len(df), dtype=bool)
+                                for value in values:
+                                    positions = value_index.get(value)
+                                    if positions is not None:
+                                        column_mask[positions] = True
+                            else:
+                                column_mask = GroupProcessor.value_mask(df[column_names[column]], values)
+                            mask = column_mask if mask is None else mask & column_mask
+                        else:
+                            print(f"警告: 在工作表 '{sheet_name}' 中找不到列 '{column}'，跳过此筛选条件")
+                    
+                    filters_applied = mask is not None
+                    if filters_applied:
+                        sheet_df = df[mask]
+                        print(f"已为工作表 '{sheet_name}' 应用筛选条件，筛选后行数: {len(sheet_df)}")
+                    else:
+                        sheet_df = df
+                    
+                    # 添加到结果字典
+                    all_dfs[sheet_name] = sheet_df
+                    if filters_applied:
+                        processed_sheets.append(sheet_name)
+                    else:
+                        print(f"工作表 '{sheet_name}' 没有应用任何筛选条件，保留所有行")
+                        
+                except Exception as e:
+                    print(f"处理工作表 '{sheet_name}' 时出错: {str(e)}")
+                    skipped_sheets.append(sheet_name)
+            
+            # 如果没有成功处理任何工作表，则报告错误
+            if not all_dfs:
+                raise Exception("无法处理任何工作表")
+            
+            # 将所有工作表写入新文件，只写模式逐行追加，不在内存中建立完整的单元格对象
+            try:
+                wb = openpyxl.Workbook(write_only=True)
+                for sheet_name, sheet_df in all_dfs.items():
+                    ws = wb.create_sheet(title=sheet_name)
+                    if len(sheet_df.columns) == 0:
+                        continue
+                    # 如果筛选后的数据为空，只保留标题行
+                    if len(sheet_df) == 0:
+                        print(f"警告: 工作表 '{sheet_name}' 筛选后没有数据，只保留标题行")
+                    
+                    # 标题行与pandas导出时一样加粗
+                    header_cells = []
+                    for column in sheet_df.columns:
+                        cell = WriteOnlyCell(ws, value=column)
+                        cell.font = Font(bold=True)
+                        header_cells.append(cell)
+                    ws.append(header_cells)
+                    
+                    # 分块转换为Python对象，不为整张表同时生成对象副本；空值(NaN/NaT)写为空单元格
+                    for start in range(0, len(sheet_df), GroupProcessor.WRITE_CHUNK_ROWS):
+                        chunk = sheet_df.iloc[start:start + GroupProcessor.WRITE_CHUNK_ROWS]
+                        values_df = chunk.astype(object).where(chunk.notna(), None)
+                        for row in values_df.itertuples(index=False, name=None):
+                            ws.append(row)
+                wb.save(output_path)
+            except PermissionError:
+                raise
+            except Exception as e:
+                raise Exception(f"写入Excel文件时出错: {str(e)}")
+                    
+            # 输出处理报告，汇总信息由界面在全部条件组完成后统一显示
+            print(f"已使用备用方法处理文件 \"{os.path.basename(output_path)}\"，"
+                  f"已应用筛选条件的工作表: {processed_sheets}，处理失败的工作表: {skipped_sheets}")
+            
+        except PermissionError:
+            raise PermissionError(f"无法写入文件，可能是权限不足或文件被其他程序占用:\n{output_path}")
+
+def _process_group(excel_file, group_data, output_path, method, df_dict=None, value_indices=None):
+    """处理单个条件组并返回生成的文件名，参数均可被pickle以便在进程池中执行
+    
+    method: 'openpyxl' 保留格式和公式，'pandas' 备用方法；流式方法一次处理所有条件组，见StreamingWorker
+    """
+    condition_group = ConditionGroup.from_dict(group_data)
+    if method == 'openpyxl':
+        # 使用openpyxl方法处理
+        GroupProcessor.process_with_openpyxl(excel_file, condition_group, output_path)
+    else:
+        # 使用pandas方法处理，界面只加载了预览数据时在这里读取完整数据
+        if df_dict is None:
+            df_dict = pd.read_excel(excel_file, sheet_name=None)
+        GroupProcessor.process_with_pandas(df_dict, condition_group, output_path, value_indices)
+    return os.path.basename(output_path)
+
+# 后台处理线程与界面之间通信的信号，QRunnable本身不是QObject，不能直接定义信号
+class WorkerSignals(QObject):
+    status = pyqtSignal(str)  # 状态文本
+    done = pyqtSignal(str)  # 成功生成的文件名
+    error = pyqtSignal(str, str)  # 条件组名称, 错误信息
+    finished = pyqtSignal()  # 无论成功与否，条件组处理结束
+
+# 在线程池中处理单个条件组，不直接操作任何界面控件
+class GroupWorker(QRunnable):
+    def __init__(self, executor, excel_file, condition_group, output_path, method, df_dict=None, value_indices=None):
+        super().__init__()
+        self.executor = executor  # 进程池，为None时在当前线程中直接处理
+        self.excel_file = excel_file
+        self.condition_group = condition_group
+        self.output_path = output_path
+        self.method = method
+        self.df_dict = df_dict
+        self.value_indices = value_indices
+        self.signals = WorkerSignals()
+    
+    def run(self):
+        group = self.condition_group
+        args = (self.excel_file, group.to_dict(), self.output_path, self.method, self.df_dict, self.value_indices)
+        try:
+            self.signals.status.emit(f'正在处理条件组: {group.name}')
+            if self.executor is None:
+                file_name = _process_group(*args)
+            else:
+                # 在子进程中处理，绕开GIL，线程只负责等待结果并转发信号
+                file_name = self.executor.submit(_process_group, *args).result()
+            self.signals.done.emit(file_name)
+        except Exception as e:
+            error_details = traceback.format_exc()
+            print(f"处理条件组 '{group.name}' 时出错: {str(e)}\n{error_details}")
+            self.signals.error.emit(group.name, str(e))
+        finally:
+            self.signals.finished.emit()
+
+# 流式方法：一个任务读取一遍源文件，同时生成所有条件组的文件
+class StreamingWorker(QRunnable):
+    def __init__(self, excel_file, condition_groups, output_paths):
+        super().__init__()
+        self.excel_file = excel_file
+        self.condition_groups = condition_groups
+        self.output_paths = output_paths
+        self.signals = WorkerSignals()
+    
+    def run(self):
+        try:
+            self.signals.status.emit(f'正在流式处理 {len(self.condition_groups)} 个条件组...')
+            errors = GroupProcessor.process_streaming(self.excel_file, self.condition_groups, self.output_paths)
+        except Exception as e:
+            error_details = traceback.format_exc()
+            print(f"流式处理条件组时出错: {str(e)}\n{error_details}")
+            errors = [str(e)] * len(self.condition_groups)
+        
+        for group, output_path, error in zip(self.condition_groups, self.output_paths, errors):
+            if error is None:
+                self.signals.done.emit(os.path.basename(output_path))
+            else:
+                self.signals.error.emit(group.name, error)
+            self.signals.finished.emit()
+
+# 条件组文件读写线程，data为None时读取文件，否则把data写入文件
+class JSONIOWorker(QThread):
+    finished_ok = pyqtSignal(object)  # 读取时为解析结果，写入时为None
+    finished_err = pyqtSignal(str)  # 可直接显示给用户的错误信息
+    
+    def __init__(self, file_path, data=None):
+        super().__init__()
+        self.file_path = file_path
+        self.data = data
+    
+    def run(self):
+        try:
+            if self.data is None:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                try:
+                    result = json_loads(text)
+                except json.JSONDecodeError as e:
+                    self.finished_err.emit(f'无效的JSON文件格式: {str(e)}')
+                    return
+                self.finished_ok.emit(result)
+            else:
+                text = json_dumps(self.data)
+                with open(self.file_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                self.finished_ok.emit(None)
+        except FileNotFoundError:
+            self.finished_err.emit(f'找不到文件: {self.file_path}')
+        except PermissionError:
+            if self.data is None:
+                self.finished_err.emit(f'无法读取文件，可能是权限不足: {self.file_path}')
+            else:
+                self.finished_err.emit(f'无法写入文件，可能是权限不足或文件被其他程序占用:\n{self.file_path}')
+        except Exception as e:
+            error_details = traceback.format_exc()
+            action = '导入' if self.data is None else '导出'
+            print(f"{action}条件组时出错: {str(e)}\n{error_details}")
+            self.finished_err.emit(f'{action}条件组时出错: {str(e)}\n\n详细信息:\n{error_details}')
+
+# Excel文件打开线程，避免解析文件时界面卡住
+class ExcelLoadWorker(QThread):
+    finished_ok = pyqtSignal(object)  # 打开结果 {属性名: 值}
+    finished_err = pyqtSignal(str)  # 可直接显示给用户的错误信息
+    
+    def __init__(self, file_path, full_check_mb):
+        super().__init__()
+        self.file_path = file_path
+        self.full_check_mb = full_check_mb  # 不超过此大小的文件可能用openpyxl方法处理，需要完整加载验证
+    
+    def run(self):
+        try:
+            import warnings
+            
+            # 关闭pandas警告
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                
+                # 根据文件大小选择加载方式，文件大于10MB时只读取预览数据
+                file_size = os.path.getsize(self.file_path) / (1024 * 1024)  # 转换为MB
+                use_pandas = file_size <= 10
+                
+                # 只打开一次Excel文件，后续各sheet的解析复用同一个压缩包和共享字符串表
+                # 完整读取的小文件优先用calamine引擎解析；大文件需要openpyxl只读模式流式读取预览
+                pd_excel = None
+                if use_pandas and HAS_CALAMINE:
+                    try:
+                        pd_excel = pd.ExcelFile(self.file_path, engine='calamine')
+                    except Exception as e:
+                        print(f"calamine引擎无法打开文件，改用默认引擎: {str(e)}")
+                if pd_excel is None:
+                    pd_excel = pd.ExcelFile(self.file_path)
+                
+                # 提前验证文件能否被openpyxl正常打开，批量处理时直接使用结果
+                openpyxl_error_msg = ''
+                try:
+                    if file_size <= self.full_check_mb:
+                        # 只读模式不解析工作表XML（如合并单元格），要用与处理时相同的方式完整加载才能发现问题
+                        GroupProcessor.load_source_workbook(self.file_path).close()
+                    elif not isinstance(pd_excel.book, openpyxl.Workbook):
+                        # 更大的文件只会用流式方法处理，能以只读模式打开即可
+                        # pandas读取xlsx时已经用openpyxl只读模式打开过，无需再打开一次
+                        openpyxl.load_workbook(self.file_path, read_only=True).close()
+                    openpyxl_loadable = True
+                except Exception as e:
+                    openpyxl_loadable = False
+                    openpyxl_error_msg = str(e)
+            
+            self.finished_ok.emit({
+                '_pd_excel': pd_excel,
+                'sheet_names': pd_excel.sheet_names,
+                'use_pandas': use_pandas,
+                '_openpyxl_loadable': openpyxl_loadable,
+                '_openpyxl_error_msg': openpyxl_error_msg,
+            })
+        except Exception as e:
+            error_details = traceback.format_exc()
+            print(f"读取Excel文件出错: {str(e)}\n{error_details}")
+            self.finished_err.emit(f"读取Excel文件出错: {str(e)}")
 
-# 批处理条件组类，用于存储多sheet并拆的条件
-class ConditionGroup:
-    def __init__(self, name=""):
-        self.name = name if name else "未命名条件组"
-        self.conditions = []  # [{sheet, column, values}]
-    
-    def add_condition(self, sheet, column, values):
-        """添加一个筛选条件"""
-        self.conditions.append({
-            'sheet': sheet,
-            'column': column,
-            'values': values
-        })
+# 工作表数据读取线程，在后台执行解析工作表、读取整列等耗时操作
+class SheetDataWorker(QThread):
+    finished_ok = pyqtSignal(object)  # task的返回值
+    finished_err = pyqtSignal(str)  # 可直接显示给用户的错误信息
     
-    def remove_condition(self, index):
-        """删除指定索引的筛选条件"""
-        if 0 <= index < len(self.conditions):
-            del self.conditions[index]
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
     
-    def clear_conditions(self):
-        """清空所有筛选条件"""
-        self.conditions = []
+    def run(self):
+        try:
+            result = self.task()
+        except Exception as e:
+            error_details = traceback.format_exc()
+            print(f"读取工作表数据出错: {str(e)}\n{error_details}")
+            self.finished_err.emit(f"读取工作表数据出错: {str(e)}")
+        else:
+            self.finished_ok.emit(result)
 
 # 多sheet批处理界面组件
 class BatchProcessingWidget(QWidget):
+    STREAMING_THRESHOLD_MB = 20  # 超过此大小的文件使用流式方法处理
+    UNIQUE_CACHE_SIZE = 32  # 唯一值缓存最多保留的列数，超出时淘汰最久未使用的列
+    SEARCH_DELAY_MS = 150  # 搜索框停止输入多久后开始过滤列表
+    EXCEL_CACHE_SIZE = 2  # 最多缓存的已加载文件数，超出时关闭最久未使用文件的句柄
+    # 与当前文件绑定的状态，按文件缓存，重新选择同一文件时整体恢复
+    FILE_STATE_ATTRS = ('_pd_excel', 'sheet_names', 'df_dict', 'use_pandas', '_column_cache',
+                        '_unique_cache', '_value_index_cache', '_openpyxl_loadable', '_openpyxl_error_msg')
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent  # 父窗口，用于访问其方法和属性
         self.excel_file = None  # 当前Excel文件路径
         self.df_dict = {}  # 存储所有sheet的DataFrame
+        self._pd_excel = None  # 当前Excel文件的pd.ExcelFile句柄
+        self._column_cache = {}  # 每个sheet的列名缓存 {sheet: {显示文本: 原始列名}}
+        self._unique_cache = OrderedDict()  # 每个(sheet, 列)的唯一值缓存，按最近使用排序
+        self._value_index_cache = {}  # 每个(sheet, 列)按字符串值分组的行号，供pandas备用方法筛选
+        self._openpyxl_loadable = False  # 当前文件能否被openpyxl正常打开
+        self._openpyxl_error_msg = ''  # 不能打开时的错误信息
+        self._json_worker = None  # 正在运行的条件组文件读写线程
+        self._load_worker = None  # 正在运行的Excel文件打开线程
+        self._sheet_worker = None  # 正在运行的工作表数据读取线程
+        self._sheet_tasks = []  # 等待执行的读取任务 [(task, on_success, on_error)]
+        self._excel_cache = OrderedDict()  # 已加载文件的缓存 {(路径, 修改时间): 加载结果}，按最近使用排序
         
         # 条件组列表
         self.condition_groups = []  # 存储ConditionGroup对象
@@ -439,29 +1329,16 @@ class BatchProcessingWidget(QWidget):
         main_layout.addWidget(splitter, 1)
         
         # 左侧：条件组列表区域
-        left_group = QGroupBox("条件组列表")
+        self.groups_panel = left_group = QGroupBox("条件组列表")
         left_group.setObjectName("主要拆分条件")
         left_layout = QVBoxLayout(left_group)
         left_layout.setContentsMargins(5, 10, 5, 5)  # 减小内边距
         
-        # 创建左侧滚动区域
-        left_scroll = QScrollArea()
-        left_scroll.setWidgetResizable(True)
-        left_scroll.setFrameShape(QFrame.NoFrame)
-        left_content = QWidget()
-        left_content_layout = QVBoxLayout(left_content)
-        left_content_layout.setContentsMargins(0, 0, 0, 0)
-        
-        # 条件组列表滚动区域
-        group_list_scroll = QScrollArea()
-        group_list_scroll.setWidgetResizable(True)
-        group_list_scroll.setMinimumHeight(200)
-        
+        # 条件组列表自带滚动条，直接放入面板，不再嵌套滚动区域
         self.group_list = QListWidget()
+        self.group_list.setMinimumHeight(200)
         self.group_list.itemClicked.connect(self.group_selected)
-        
-        group_list_scroll.setWidget(self.group_list)
-        left_content_layout.addWidget(group_list_scroll)
+        left_layout.addWidget(self.group_list)
         
         # 条件组操作按钮
         group_btn_layout = QHBoxLayout()
@@ -475,7 +1352,7 @@ class BatchProcessingWidget(QWidget):
         self.remove_group_btn.setEnabled(False)
         group_btn_layout.addWidget(self.remove_group_btn)
         
-        left_content_layout.addLayout(group_btn_layout)
+        left_layout.addLayout(group_btn_layout)
         
         # 添加导入/导出条件组按钮
         io_btn_layout = QHBoxLayout()
@@ -489,27 +1366,15 @@ class BatchProcessingWidget(QWidget):
         self.export_groups_btn.setEnabled(False)
         io_btn_layout.addWidget(self.export_groups_btn)
         
-        left_content_layout.addLayout(io_btn_layout)
-        
-        # 设置左侧滚动区域
-        left_scroll.setWidget(left_content)
-        left_layout.addWidget(left_scroll)
+        left_layout.addLayout(io_btn_layout)
         
         # 添加左侧面板到分割器
         splitter.addWidget(left_group)
         
         # 右侧：条件编辑区域
-        right_group = QGroupBox("条件编辑")
+        self.conditions_panel = right_group = QGroupBox("条件编辑")
         right_layout = QVBoxLayout(right_group)
         
-        # 创建右侧滚动区域
-        right_scroll = QScrollArea()
-        right_scroll.setWidgetResizable(True)
-        right_scroll.setFrameShape(QFrame.NoFrame)
-        right_content = QWidget()
-        right_content_layout = QVBoxLayout(right_content)
-        right_content_layout.setContentsMargins(0, 0, 0, 0)
-        
         # 条件组名称编辑
         name_layout = QHBoxLayout()
         name_layout.addWidget(QLabel("条件组名称:"))
@@ -517,33 +1382,27 @@ class BatchProcessingWidget(QWidget):
         self.group_name_edit.setPlaceholderText("输入条件组名称")
         self.group_name_edit.textChanged.connect(self.update_group_name)
         name_layout.addWidget(self.group_name_edit)
-        right_content_layout.addLayout(name_layout)
-        
-        # 条件表格滚动区域
-        table_scroll = QScrollArea()
-        table_scroll.setWidgetResizable(True)
-        table_scroll.setMinimumHeight(200)
-        table_widget = QWidget()
-        table_layout = QVBoxLayout(table_widget)
-        
-        self.condition_table = QTableWidget()
-        self.condition_table.setColumnCount(4)  # 工作表、列、值、操作
-        self.condition_table.setHorizontalHeaderLabels(["工作表", "列", "值", "操作"])
-        self.condition_table.setSelectionBehavior(QTableWidget.SelectRows)
-        table_layout.addWidget(self.condition_table)
-        
-        table_scroll.setWidget(table_widget)
-        right_content_layout.addWidget(table_scroll)
+        right_layout.addLayout(name_layout)
+        
+        # 条件表格自带滚动条，直接放入面板，不再嵌套滚动区域
+        self.condition_model = ConditionTableModel(self)
+        self.condition_table = QTableView()
+        self.condition_table.setModel(self.condition_model)  # 工作表、列、值、操作
+        self.condition_table.setMinimumHeight(200)
+        self.condition_table.setSelectionBehavior(QTableView.SelectRows)
+        self.condition_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        
+        # 操作列使用按钮委托
+        self.delete_delegate = ButtonDelegate(self.condition_table)
+        self.delete_delegate.clicked.connect(self.remove_condition_from_table)
+        self.condition_table.setItemDelegateForColumn(3, self.delete_delegate)
+        right_layout.addWidget(self.condition_table)
         
         # 添加条件按钮
         self.add_condition_btn = QPushButton('添加筛选条件')
         self.add_condition_btn.clicked.connect(self.add_condition_dialog)
         self.add_condition_btn.setEnabled(False)
-        right_content_layout.addWidget(self.add_condition_btn)
-        
-        # 设置右侧滚动区域
-        right_scroll.setWidget(right_content)
-        right_layout.addWidget(right_scroll)
+        right_layout.addWidget(self.add_condition_btn)
         
         # 添加分割组件到主分割窗口
         splitter.addWidget(right_group)
@@ -559,6 +1418,12 @@ class BatchProcessingWidget(QWidget):
         self.process_btn.setEnabled(False)
         bottom_layout.addWidget(self.process_btn)
         
+        # 取消勾选时只输出数据，源文件只读取一遍即可生成所有条件组的文件，速度更快
+        self.preserve_format_check = QCheckBox('保留格式和公式')
+        self.preserve_format_check.setChecked(True)
+        self.preserve_format_check.setToolTip('取消勾选后只保留数据和标题行格式，公式只保留计算结果，处理速度更快')
+        bottom_layout.addWidget(self.preserve_format_check)
+        
         # 进度条和状态
         progress_layout = QHBoxLayout()
         
@@ -582,75 +1447,264 @@ class BatchProcessingWidget(QWidget):
             return
             
         try:
-            self.status_label.setText("正在读取Excel文件...")
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setMaximum(0)  # 不确定进度
-            QApplication.processEvents()
-            
-            self.selected_file = file_path
-            self.excel_file = file_path  # 确保self.excel_file被赋值
-            self.file_path_label.setText(os.path.basename(file_path))
-            
-            # 使用pandas直接读取文件，不显示任何对话框
-            try:
-                # 不显示任何预览窗口和对话框，直接读取
-                import pandas as pd
-                import warnings
-                
-                # 关闭pandas警告
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    
-                    # 读取Excel文件的所有sheet
-                    excel_file = pd.ExcelFile(file_path)
-                    self.sheet_names = excel_file.sheet_names
-                    
-                    # 根据文件大小选择加载方式
-                    file_size = os.path.getsize(file_path) / (1024 * 1024)  # 转换为MB
-                    
-                    # 确保df_dict已初始化
-                    self.df_dict = {}
-                    
-                    if file_size > 10:  # 如果文件大于10MB使用openpyxl
-                        self.use_pandas = False
-                        self.workbook = openpyxl.load_workbook(file_path, data_only=False)
-                        self.sheet_names = self.workbook.sheetnames
-                        self.data = {}  # 兼容性字典
-                        
-                        # 对于大文件，仍然需要为每个sheet创建一个DataFrame以便于条件选择
-                        for sheet in self.sheet_names:
-                            try:
-                                # 只读取前1000行来提取列名和预览数据
-                                temp_df = pd.read_excel(file_path, sheet_name=sheet, nrows=1000)
-                                self.df_dict[sheet] = temp_df
-                            except Exception as e:
-                                print(f"读取工作表 {sheet} 数据时出错: {str(e)}")
-                    else:
-                        self.use_pandas = True
-                        self.data = {}  # 存储所有sheet的DataFrame
-                        # 读取所有sheet的数据
-                        for sheet in self.sheet_names:
-                            self.data[sheet] = pd.read_excel(file_path, sheet_name=sheet)
-                            self.df_dict[sheet] = self.data[sheet]  # 兼容性
-                
-                self.status_label.setText("Excel文件已加载")
-                
-                # 批处理模式下启用添加条件组按钮
-                self.add_group_btn.setEnabled(True)
-                
-            except Exception as e:
-                error_details = traceback.format_exc()
-                print(f"读取Excel文件出错: {str(e)}\n{error_details}")
-                QMessageBox.critical(self, "错误", f"读取Excel文件出错: {str(e)}")
-                self.status_label.setText("文件加载失败")
-                
-        except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"读取Excel文件出错: {str(e)}\n{error_details}")
+            # 同一文件且未被修改时直接复用上次的加载结果，避免重复解析
+            cache_key = (file_path, os.path.getmtime(file_path))
+        except OSError as e:
             QMessageBox.critical(self, "错误", f"读取Excel文件出错: {str(e)}")
             self.status_label.setText("文件加载失败")
+            return
+        
+        if cache_key in self._excel_cache:
+            self._excel_cache.move_to_end(cache_key)
+            for attr, value in self._excel_cache[cache_key].items():
+                setattr(self, attr, value)
+            self.on_file_loaded(file_path)
+            return
+        
+        # 在后台线程中打开文件，期间界面保持响应
+        self.status_label.setText("正在读取Excel文件...")
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(0)  # 不确定进度
+        self.select_file_btn.setEnabled(False)
+        
+        worker = ExcelLoadWorker(file_path, self.STREAMING_THRESHOLD_MB)
+        worker.finished_ok.connect(lambda state: self.on_excel_opened(file_path, cache_key, state))
+        worker.finished_err.connect(self.on_excel_load_error)
+        worker.finished.connect(self.on_load_worker_finished)
+        self._load_worker = worker  # 保留引用，避免线程运行中被回收
+        worker.start()
+    
+    def on_excel_opened(self, file_path, cache_key, state):
+        """后台线程打开文件成功，初始化与该文件绑定的状态并缓存"""
+        # 同一路径的旧缓存已过期（文件被修改），关闭其文件句柄
+        for key in [key for key in self._excel_cache if key[0] == file_path]:
+            self._excel_cache.pop(key)['_pd_excel'].close()
+        
+        for attr, value in state.items():
+            setattr(self, attr, value)
+        
+        # 各sheet的数据在第一次用到时才读取
+        self.df_dict = {}
+        self._column_cache = {}  # {sheet: {显示文本: 原始列名}}
+        self._unique_cache = OrderedDict()  # {(sheet, column): (唯一值,)}
+        self._value_index_cache = {}  # {(sheet, column): {值: 行号数组}}
+        
+        self._excel_cache[cache_key] = {attr: getattr(self, attr) for attr in self.FILE_STATE_ATTRS}
+        # 缓存的文件会保持打开（Windows下文件被锁定）并占用解析后的数据，只保留最近使用的几个
+        while len(self._excel_cache) > self.EXCEL_CACHE_SIZE:
+            _, evicted = self._excel_cache.popitem(last=False)
+            evicted['_pd_excel'].close()
+        self.on_file_loaded(file_path)
+    
+    def on_file_loaded(self, file_path):
+        """文件状态就绪后更新界面"""
+        self.selected_file = file_path
+        self.excel_file = file_path  # 确保self.excel_file被赋值
+        self.file_path_label.setText(os.path.basename(file_path))
+        self.status_label.setText("Excel文件已加载")
+        
+        # 批处理模式下启用添加条件组按钮
+        self.add_group_btn.setEnabled(True)
+    
+    def on_excel_load_error(self, message):
+        """后台线程打开文件失败"""
+        QMessageBox.critical(self, "错误", message)
+        self.status_label.setText("文件加载失败")
+    
+    def on_load_worker_finished(self):
+        """Excel文件打开线程结束"""
+        self._load_worker = None
+        self.progress_bar.setVisible(False)
+        self.select_file_btn.setEnabled(True)
+    
+    def run_sheet_task(self, task, on_success, on_error=None):
+        """在后台线程中执行读取工作表数据的任务，完成后在界面线程调用on_success(结果)
+        
+        各任务共用同一个文件句柄和缓存，按提交顺序逐个执行；执行期间不能切换文件
+        """
+        self._sheet_tasks.append((task, on_success, on_error or self.on_sheet_task_error))
+        self.select_file_btn.setEnabled(False)
+        if self._sheet_worker is None:
+            self.start_next_sheet_task()
+    
+    def start_next_sheet_task(self):
+        """启动队列中的下一个读取任务"""
+        task, on_success, on_error = self._sheet_tasks.pop(0)
+        worker = SheetDataWorker(task)
+        worker.finished_ok.connect(on_success)
+        worker.finished_err.connect(on_error)
+        worker.finished.connect(self.on_sheet_worker_finished)
+        self._sheet_worker = worker  # 保留引用，避免线程运行中被回收
+        worker.start()
+    
+    def on_sheet_task_error(self, message):
+        """读取工作表数据失败"""
+        QMessageBox.warning(self, "警告", message)
+    
+    def on_sheet_worker_finished(self):
+        """工作表数据读取线程结束，继续执行队列中的任务"""
+        self._sheet_worker = None
+        if self._sheet_tasks:
+            self.start_next_sheet_task()
+        elif self._load_worker is None:
+            self.select_file_btn.setEnabled(True)
+    
+    def get_sheet_df(self, sheet):
+        """返回工作表的数据，第一次访问时才读取（大文件只读取预览数据）"""
+        df = self.df_dict.get(sheet)
+        if df is None:
+            try:
+                if self.use_pandas:
+                    try:
+                        df = self._pd_excel.parse(sheet)
+                    except Exception as e:
+                        if self._pd_excel.engine != 'calamine':
+                            raise
+                        # calamine不能解析的工作表（如格式不规范）改用默认引擎读取
+                        print(f"calamine引擎读取工作表 {sheet} 出错，改用默认引擎: {str(e)}")
+                        df = pd.read_excel(self.excel_file, sheet_name=sheet)
+                else:
+                    # 只读取前200行来提取列名和预览数据
+                    df = self.read_sheet_preview(sheet, 200)
+            except Exception as e:
+                print(f"读取工作表 {sheet} 数据时出错: {str(e)}")
+                df = pd.DataFrame()
+            self.df_dict[sheet] = df
+            # 记录该sheet的列名（显示文本 -> 原始列名）
+            self._column_cache[sheet] = dict(zip(df.columns.astype(str).tolist(), df.columns))
+        return df
+    
+    def get_sheet_columns(self, sheet):
+        """返回工作表的列名 {显示文本: 原始列名}"""
+        self.get_sheet_df(sheet)
+        return self._column_cache[sheet]
+    
+    def get_unique_values(self, sheet, column):
+        """返回列中排序后的唯一值，按(sheet, 列)缓存并淘汰最久未使用的列"""
+        key = (sheet, column)
+        if key in self._unique_cache:
+            self._unique_cache.move_to_end(key)
+            return self._unique_cache[key]
+        
+        columns = self.get_sheet_columns(sheet)
+        if column not in columns:
+            return ()
+        
+        df = self.df_dict[sheet]
+        if self.use_pandas:
+            series = df[columns[column]]
+        else:
+            # 大文件只加载了预览数据，单独读取这一列的全部行
+            col_pos = df.columns.get_loc(columns[column])
+            book = self._pd_excel.book
+            series = None
+            if HAS_CALAMINE:
+                # calamine引擎解码整列比openpyxl逐个单元格解析快数倍
+                try:
+                    series = pd.read_excel(self.excel_file, sheet_name=sheet, usecols=[col_pos],
+                                           engine='calamine').iloc[:, 0]
+                except Exception as e:
+                    print(f"calamine引擎读取列 {column} 出错，改用默认方式读取: {str(e)}")
+            if series is not None:
+                pass
+            elif isinstance(book, openpyxl.Workbook):
+                # xlsx直接流式扫描只读工作簿中的这一列，比pandas解析整张表再取列更快
+                rows = book[sheet].iter_rows(min_row=2, min_col=col_pos + 1, max_col=col_pos + 1, values_only=True)
+                series = pd.Series([row[0] for row in rows])
+            else:
+                # 其他格式交给pandas引擎，只保留这一列
+                series = self._pd_excel.parse(sheet, usecols=[col_pos]).iloc[:, 0]
+        
+        values = tuple(self.sorted_unique_values(series))
+        self._unique_cache[key] = values
+        if len(self._unique_cache) > self.UNIQUE_CACHE_SIZE:
+            self._unique_cache.popitem(last=False)
+        return values
+    
+    def get_value_index(self, sheet, column):
+        """返回数据列按字符串值分组的行号 {值: 行号数组}，结果缓存到重新加载文件为止"""
+        key = (sheet, column)
+        if key not in self._value_index_cache:
+            if sheet not in self.sheet_names:
+                return None
+            df = self.get_sheet_df(sheet)
+            # column是列名文本，映射回原始列名（如数字列名）
+            columns = self._column_cache[sheet]
+            if column not in columns:
+                return None
+            # 整列只分解一次为整数编码并按编码分组，之后各条件组按值直接取行号
+            # 编码对应的文本与唯一值列表中的str(值)一致
+            codes, texts = GroupProcessor.factorize_as_str(df[columns[column]])
+            self._value_index_cache[key] = {
+                texts[code]: positions
+                for code, positions in pd.Series(codes).groupby(codes, sort=False).indices.items()
+                if code >= 0  # 跳过空值
+            }
+        return self._value_index_cache[key]
+    
+    def read_sheet_preview(self, sheet, nrows):
+        """读取工作表的前nrows行数据作为预览"""
+        # xlsx文件由pandas以openpyxl只读模式打开，直接流式读取行，不构建完整的单元格对象树
+        book = self._pd_excel.book
+        if not isinstance(book, openpyxl.Workbook):
+            return self._pd_excel.parse(sheet, nrows=nrows)
+        
+        rows = book[sheet].iter_rows(max_row=nrows + 1, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        
+        # 只读模式下各行长度可能不同，按最宽的一行补齐列名
+        df = pd.DataFrame(list(rows))
+        header = list(header) + [None] * (len(df.columns) - len(header))
+        df = df.reindex(columns=range(len(header)))
+        
+        # 与pandas.read_excel保持一致：去掉末尾的空列，空列名命名为"Unnamed: n"
+        while header and header[-1] is None and df[len(header) - 1].isna().all():
+            header.pop()
+            df = df.drop(columns=len(header))
+        header = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+        
+        # 重复的列名按pandas的方式依次改为"列名.1"、"列名.2"，保证每列都能按列名唯一定位
+        counts = {}
+        for i, name in enumerate(header):
+            count = counts.get(name, 0)
+            while count > 0:
+                counts[name] = count + 1
+                name = f"{name}.{count}"
+                count = counts.get(name, 0)
+            header[i] = name
+            counts[name] = count + 1
+        df.columns = header
+        return df
+    
+    @staticmethod
+    def fill_list_widget(list_widget, texts):
+        """用一次addItems调用替换列表内容，期间暂停重绘和信号"""
+        list_widget.setUpdatesEnabled(False)
+        list_widget.blockSignals(True)
+        try:
+            list_widget.clear()
+            list_widget.addItems(texts)
         finally:
-            self.progress_bar.setVisible(False)
+            list_widget.blockSignals(False)
+            list_widget.setUpdatesEnabled(True)
+    
+    @staticmethod
+    def sorted_unique_values(series):
+        """返回列中去重、排序后的非空值（字符串形式）"""
+        if series.dtype == object:
+            # 对象列中1、1.0和True会被unique()合并，先转换为文本再去重
+            return sorted(series.dropna().astype(str).unique().tolist())
+        unique_values = pd.Series(series.dropna().unique())
+        kind = unique_values.dtype.kind
+        if kind in 'Mm':
+            # 日期类型按时间排序，逐个转换以保持与单元格值str()一致的文本
+            return [str(value) for value in unique_values.sort_values().tolist()]
+        if kind in 'iuf':
+            # 数值类型用pandas排序后转换为与单元格一致的文本
+            return [GroupProcessor.value_text(value) for value in unique_values.sort_values().tolist()]
+        return sorted(unique_values.astype(str).tolist())
     
     def add_condition_group(self):
         """添加新的条件组"""
@@ -680,7 +1734,7 @@ class BatchProcessingWidget(QWidget):
             # 重置当前索引
             self.current_group_index = -1
             self.group_name_edit.setText("")
-            self.condition_table.setRowCount(0)
+            self.condition_model.set_group(None)
             self.add_condition_btn.setEnabled(False)
             
             # 禁用删除按钮
@@ -691,11 +1745,7 @@ class BatchProcessingWidget(QWidget):
     
     def update_group_list(self):
         """更新条件组列表显示"""
-        self.group_list.clear()
-        
-        for group in self.condition_groups:
-            item = QListWidgetItem(group.name)
-            self.group_list.addItem(item)
+        self.fill_list_widget(self.group_list, [group.name for group in self.condition_groups])
         
         # 根据是否有条件组来启用/禁用导出按钮
         self.export_groups_btn.setEnabled(len(self.condition_groups) > 0)
@@ -728,55 +1778,18 @@ class BatchProcessingWidget(QWidget):
             self.group_list.item(self.current_group_index).setText(text)
     
     def update_condition_table(self):
-        """更新条件表格内容"""
-        self.condition_table.setRowCount(0)  # 清空表格
-        
+        """将条件表格切换到当前条件组"""
         if self.current_group_index < 0 or self.current_group_index >= len(self.condition_groups):
+            self.condition_model.set_group(None)
             return
             
-        conditions = self.condition_groups[self.current_group_index].conditions
-        
-        for i, condition in enumerate(conditions):
-            self.condition_table.insertRow(i)
-            
-            # 工作表列
-            sheet_item = QTableWidgetItem(condition['sheet'])
-            self.condition_table.setItem(i, 0, sheet_item)
-            
-            # 列名列
-            column_item = QTableWidgetItem(condition['column'])
-            self.condition_table.setItem(i, 1, column_item)
-            
-            # 值列
-            values = condition['values']
-            if len(values) > 3:
-                values_text = f"{values[0]}, {values[1]}, {values[2]}... 等{len(values)}个值"
-            else:
-                values_text = ", ".join(str(v) for v in values)
-            values_item = QTableWidgetItem(values_text)
-            self.condition_table.setItem(i, 2, values_item)
-            
-            # 操作列（删除按钮）
-            delete_btn = QPushButton("删除")
-            delete_btn.setProperty("row", i)  # 存储行索引
-            delete_btn.clicked.connect(self.remove_condition_from_table)
-            self.condition_table.setCellWidget(i, 3, delete_btn)
-        
-        # 调整列宽
-        self.condition_table.resizeColumnsToContents()
+        self.condition_model.set_group(self.condition_groups[self.current_group_index])
     
-    def remove_condition_from_table(self):
+    def remove_condition_from_table(self, row):
         """从表格中删除条件"""
-        btn = self.sender()
-        if btn:
-            row = btn.property("row")
-            
-            if self.current_group_index >= 0 and self.current_group_index < len(self.condition_groups):
-                # 删除条件
-                self.condition_groups[self.current_group_index].remove_condition(row)
-                
-                # 更新表格
-                self.update_condition_table()
+        if self.current_group_index >= 0 and self.current_group_index < len(self.condition_groups):
+            # 删除条件，模型只通知视图移除对应的一行
+            self.condition_model.remove_condition(row)
     
     def add_condition_dialog(self):
         """打开添加筛选条件的对话框"""
@@ -790,62 +1803,114 @@ class BatchProcessingWidget(QWidget):
         
         layout = QVBoxLayout(dialog)
         
+        def make_filtered_view(layout, source_model, placeholder):
+            """创建带搜索框的列表视图，过滤交给QSortFilterProxyModel在C++中完成"""
+            search_edit = QLineEdit()
+            search_edit.setPlaceholderText(placeholder)
+            proxy = QSortFilterProxyModel(dialog)
+            proxy.setSourceModel(source_model)
+            proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+            # 连续输入时只在停顿后过滤一次，唯一值很多时不会每个按键都重新过滤整个列表
+            filter_timer = QTimer(dialog)
+            filter_timer.setSingleShot(True)
+            filter_timer.setInterval(self.SEARCH_DELAY_MS)
+            filter_timer.timeout.connect(lambda: proxy.setFilterFixedString(search_edit.text()))
+            
+            def text_changed(text):
+                if text:
+                    filter_timer.start()
+                else:
+                    # 清空搜索框时立即显示全部项
+                    filter_timer.stop()
+                    proxy.setFilterFixedString('')
+            
+            search_edit.textChanged.connect(text_changed)
+            view = QListView()
+            view.setModel(proxy)
+            view.setUniformItemSizes(True)
+            layout.addWidget(search_edit)
+            layout.addWidget(view)
+            return view, search_edit
+        
+        # 当前选中的工作表和列，过滤列表时不会丢失
+        selection = {'sheet': None, 'column': None}
+        
         # 工作表选择
         sheet_layout = QVBoxLayout()
         sheet_layout.addWidget(QLabel("选择工作表:"))
         
-        sheet_list = QListWidget()
-        for sheet_name in self.df_dict.keys():
-            sheet_list.addItem(sheet_name)
-        sheet_layout.addWidget(sheet_list)
+        sheet_model = QStringListModel(list(self.sheet_names), dialog)
+        sheet_list, _ = make_filtered_view(sheet_layout, sheet_model, "搜索工作表")
         
         # 列选择
         column_layout = QVBoxLayout()
         column_layout.addWidget(QLabel("选择列:"))
         
-        column_list = QListWidget()
-        column_layout.addWidget(column_list)
+        column_model = QStringListModel(dialog)
+        column_list, column_search = make_filtered_view(column_layout, column_model, "搜索列")
         
         # 值选择
         values_layout = QVBoxLayout()
         values_layout.addWidget(QLabel("选择值:"))
         
-        values_list = QListWidget()
-        values_list.setSelectionMode(QListWidget.MultiSelection)
-        values_layout.addWidget(values_list)
+        # 值列表使用模型+视图，只绘制可见行，大量唯一值时不会创建成千上万个控件
+        values_model = CheckableListModel(dialog)
+        values_list, values_search = make_filtered_view(values_layout, values_model, "搜索值")
+        
+        select_all_check = QCheckBox("全选")
+        values_layout.addWidget(select_all_check)
+        
+        def select_all_toggled(checked):
+            # 只勾选搜索后可见的值，被搜索隐藏的值保持不变
+            values_proxy = values_list.model()
+            rows = [values_proxy.mapToSource(values_proxy.index(row, 0)).row()
+                    for row in range(values_proxy.rowCount())]
+            values_model.set_rows_checked(rows, checked)
+        
+        def reset_select_all():
+            select_all_check.blockSignals(True)
+            select_all_check.setChecked(False)
+            select_all_check.blockSignals(False)
+        
+        select_all_check.toggled.connect(select_all_toggled)
+        # 搜索内容变化后可见的值不同，全选状态不再对应当前列表
+        values_search.textChanged.connect(reset_select_all)
         
         # 连接信号
-        def sheet_selected():
-            column_list.clear()
-            values_list.clear()
+        def reset_values(values):
+            reset_select_all()
+            values_search.clear()
+            values_model.set_values(values)
+        
+        def sheet_selected(index):
+            sheet = selection['sheet'] = index.data()
+            selection['column'] = None
+            column_search.clear()
+            column_model.setStringList([])
+            reset_values([])
+            
+            def show_columns(columns):
+                # 读取完成前用户可能已选择了其他sheet
+                if selection['sheet'] == sheet:
+                    column_model.setStringList(list(columns))
             
-            selected_items = sheet_list.selectedItems()
-            if selected_items:
-                selected_sheet = selected_items[0].text()
-                if selected_sheet in self.df_dict:
-                    df = self.df_dict[selected_sheet]
-                    for column in df.columns:
-                        column_list.addItem(str(column))
-        
-        def column_selected():
-            values_list.clear()
+            # sheet数据在此时才读取，在后台线程中完成后一次性把列名交给模型
+            self.run_sheet_task(lambda: self.get_sheet_columns(sheet), show_columns)
+        
+        def column_selected(index):
+            sheet = selection['sheet']
+            column = selection['column'] = index.data()
+            reset_values([])
             
-            selected_sheet_items = sheet_list.selectedItems()
-            selected_column_items = column_list.selectedItems()
+            def show_values(values):
+                if selection['sheet'] == sheet and selection['column'] == column:
+                    reset_values(values)
             
-            if selected_sheet_items and selected_column_items:
-                selected_sheet = selected_sheet_items[0].text()
-                selected_column = selected_column_items[0].text()
-                
-                if selected_sheet in self.df_dict:
-                    df = self.df_dict[selected_sheet]
-                    if selected_column in df.columns:
-                        unique_values = df[selected_column].dropna().unique().tolist()
-                        for value in sorted(unique_values, key=str):
-                            values_list.addItem(str(value))
+            # 首次选择该列时才计算唯一值（大文件需读取整列），之后直接取缓存
+            self.run_sheet_task(lambda: self.get_unique_values(sheet, column), show_values)
         
-        sheet_list.itemClicked.connect(sheet_selected)
-        column_list.itemClicked.connect(column_selected)
+        sheet_list.clicked.connect(sheet_selected)
+        column_list.clicked.connect(column_selected)
         
         # 组合布局
         selection_layout = QHBoxLayout()
@@ -870,24 +1935,16 @@ class BatchProcessingWidget(QWidget):
         cancel_button.clicked.connect(dialog.reject)
         
         def add_condition():
-            selected_sheet_items = sheet_list.selectedItems()
-            selected_column_items = column_list.selectedItems()
-            selected_values_items = values_list.selectedItems()
+            selected_sheet = selection['sheet']
+            selected_column = selection['column']
+            selected_values = values_model.checked_values()
             
-            if not selected_sheet_items or not selected_column_items or not selected_values_items:
+            if not selected_sheet or not selected_column or not selected_values:
                 QMessageBox.warning(dialog, "警告", "请选择工作表、列和至少一个值")
                 return
-                
-            selected_sheet = selected_sheet_items[0].text()
-            selected_column = selected_column_items[0].text()
-            selected_values = [item.text() for item in selected_values_items]
-            
-            # 添加条件
-            self.condition_groups[self.current_group_index].add_condition(
-                selected_sheet, selected_column, selected_values)
             
-            # 更新表格
-            self.update_condition_table()
+            # 添加条件，模型只通知视图新增的一行
+            self.condition_model.add_condition(selected_sheet, selected_column, selected_values)
             
             dialog.accept()
         
@@ -921,326 +1978,167 @@ class BatchProcessingWidget(QWidget):
             file_dir, file_name = os.path.split(self.excel_file)
             file_name_without_ext = os.path.splitext(file_name)[0]
             
-            # 验证原始文件是否可以被openpyxl正常打开
-            try:
-                self.status_label.setText('正在验证Excel文件...')
-                QApplication.processEvents()  # 让UI响应
-                test_wb = openpyxl.load_workbook(self.excel_file)
-                test_wb.close()
-                use_openpyxl_method = True
-            except Exception as e:
-                error_msg = str(e)
+            # 大文件使用流式方法处理，避免完整加载工作簿占用大量内存
+            file_size = os.path.getsize(self.excel_file) / (1024 * 1024)  # 转换为MB
+            too_large = file_size > self.STREAMING_THRESHOLD_MB
+            streaming = too_large or not self.preserve_format_check.isChecked()
+            
+            # 文件能否被openpyxl正常打开已在加载文件时验证
+            if self._openpyxl_loadable:
+                method = 'streaming' if streaming else 'openpyxl'
+                if too_large and self.preserve_format_check.isChecked():
+                    QMessageBox.warning(self, '警告', 
+                        f'文件较大({file_size:.1f}MB)，将使用流式方法处理以节省内存。\n'
+                        f'注意：此方法只保留标题行的格式，公式只保留当前计算结果。')
+            else:
                 QMessageBox.warning(self, '警告', 
                     f'您的Excel文件包含一些不标准格式，将使用替代方法处理。\n'
-                    f'某些复杂的格式可能无法完全保留。\n'
-                    f'原因: {error_msg}')
-                use_openpyxl_method = False
+                    f'某些复杂的格式可能无法完全保留，公式及其引用关系也将只保留当前计算结果。\n'
+                    f'原因: {self._openpyxl_error_msg}')
+                method = 'pandas'
             
-            # 处理每个条件组
-            processed_files = []
-            for i, group in enumerate(self.condition_groups):
-                self.status_label.setText(f'正在处理条件组: {group.name} ({i+1}/{len(self.condition_groups)})')
-                QApplication.processEvents()  # 让UI响应
+            # 每个条件组写入各自的文件，文件名相同时加序号，避免多个任务写同一个文件
+            used_names = set()
+            output_paths = []
+            for group in self.condition_groups:
+                # 安全的文件名
+                safe_name = group.name.translate(_SAFE_NAME_TABLE)[:50]
                 
-                try:
-                    # 安全的文件名
-                    safe_name = "".join(c if c.isalnum() or c in [' ', '_', '-'] else '_' for c in group.name)
-                    if len(safe_name) > 50:
-                        safe_name = safe_name[:50]
-                    
-                    # 新文件路径
-                    new_file_path = os.path.join(file_dir, f"{file_name_without_ext}_{safe_name}.xlsx")
-                    
-                    if use_openpyxl_method:
-                        # 使用openpyxl方法处理
-                        self.batch_process_with_openpyxl(group, new_file_path)
-                    else:
-                        # 使用pandas方法处理
-                        self.batch_process_with_pandas(group, new_file_path)
-                    
-                    processed_files.append(os.path.basename(new_file_path))
-                    
-                except Exception as e:
-                    error_details = traceback.format_exc()
-                    print(f"处理条件组 '{group.name}' 时出错: {str(e)}\n{error_details}")
-                    QMessageBox.warning(self, '警告', 
-                                      f'处理条件组 "{group.name}" 时出错: {str(e)}\n'
-                                      f'将跳过此条件组并继续处理其他组。')
+                unique_name = safe_name
+                suffix = 2
+                while unique_name in used_names:
+                    unique_name = f"{safe_name}_{suffix}"
+                    suffix += 1
+                used_names.add(unique_name)
                 
-                # 更新进度条
-                self.progress_bar.setValue(i + 1)
-                QApplication.processEvents()  # 让UI响应
-            
-            # 完成处理
-            if processed_files:
-                self.status_label.setText('批量处理完成!')
-                result_message = f'已成功生成 {len(processed_files)} 个文件:\n\n'
-                result_message += '\n'.join(processed_files[:10])
-                if len(processed_files) > 10:
-                    result_message += f'\n... 等总共 {len(processed_files)} 个文件'
-                result_message += f'\n\n所有文件已保存在:\n{file_dir}'
+                # 新文件路径
+                new_file_path = os.path.join(file_dir, f"{file_name_without_ext}_{unique_name}.xlsx")
                 
-                QMessageBox.information(self, '成功', result_message)
+                output_paths.append(new_file_path)
+            
+            self._batch_file_dir = file_dir
+            self.set_batch_running(True)
+            
+            # pandas备用方法需要完整数据，界面只加载了预览数据时由子进程自行读取
+            if method == 'pandas' and self.use_pandas:
+                # 尚未读取的sheet可能较多，在后台线程中读取完成后再提交各条件组
+                self.status_label.setText('正在读取工作表数据...')
+                self.run_sheet_task(self.prepare_pandas_data,
+                                    lambda data: self.submit_batch(method, output_paths, *data),
+                                    self.on_batch_prepare_error)
             else:
-                QMessageBox.warning(self, '警告', '处理过程完成，但没有生成任何文件。')
+                self.submit_batch(method, output_paths)
             
         except Exception as e:
             error_details = traceback.format_exc()
             QMessageBox.critical(self, '错误', f'批量处理时出错: {str(e)}\n\n详细信息:\n{error_details}')
-        finally:
+            self.set_batch_running(False)
             self.progress_bar.setVisible(False)
             self.status_label.setText('')
     
-    def batch_process_with_openpyxl(self, condition_group, output_path):
-        """使用openpyxl方法处理条件组"""
+    def prepare_pandas_data(self):
+        """读取pandas备用方法需要的完整数据和各条件列的值索引，在后台线程中执行"""
+        # 输出文件包含所有工作表，尚未读取的sheet此时一并读取
+        df_dict = {sheet: self.get_sheet_df(sheet) for sheet in self.sheet_names}
+        # 各条件组用到的列只按值分组一次，所有条件组共用
+        value_indices = {}
+        for group in self.condition_groups:
+            for condition in group.conditions:
+                key = (condition['sheet'], condition['column'])
+                if key not in value_indices:
+                    value_index = self.get_value_index(*key)
+                    if value_index is not None:
+                        value_indices[key] = value_index
+        return df_dict, value_indices
+    
+    def on_batch_prepare_error(self, message):
+        """读取pandas备用方法的数据失败，取消本次批量处理"""
+        QMessageBox.critical(self, '错误', f'批量处理时出错: {message}')
+        self.set_batch_running(False)
+        self.progress_bar.setVisible(False)
+        self.status_label.setText('')
+    
+    def submit_batch(self, method, output_paths, df_dict=None, value_indices=None):
+        """把各条件组提交到线程池，各组写入各自的文件，互不影响"""
         try:
-            # 复制原始文件
-            shutil.copy2(self.excel_file, output_path)
-            
-            # 打开新文件
-            wb = openpyxl.load_workbook(output_path, keep_vba=True, data_only=False, keep_links=True)
-            
-            # 存储所有工作表的行映射关系
-            sheet_row_mappings = {}
-            
-            # 处理每个条件
-            for condition in condition_group.conditions:
-                sheet_name = condition['sheet']
-                column_name = condition['column']
-                filter_values = [str(v) for v in condition['values']]  # 转换所有值为字符串以便比较
-                
-                if sheet_name not in wb.sheetnames:
-                    print(f"警告: 找不到工作表 '{sheet_name}'，跳过此筛选条件")
-                    continue
-                    
-                # 获取工作表
-                ws = wb[sheet_name]
-                
-                # 查找列索引
-                header_row = list(ws.iter_rows(min_row=1, max_row=1))[0]
-                col_index = -1
-                for idx, cell in enumerate(header_row):
-                    if str(cell.value) == column_name:
-                        col_index = idx
-                        break
-                
-                if col_index == -1:
-                    print(f"警告: 在工作表 '{sheet_name}' 中找不到列 '{column_name}'，跳过此筛选条件")
-                    continue
-                
-                # 创建行映射
-                self.status_label.setText(f'处理工作表 {sheet_name} 的公式映射关系')
-                QApplication.processEvents()
-                original_row_map = FormulaHelper.create_row_mapping(ws)
-                
-                # 收集要删除的行
-                rows_to_delete = []
-                for row_idx, row in enumerate(ws.iter_rows(min_row=2), start=2):
-                    cell_value = str(row[col_index].value) if row[col_index].value is not None else ""
-                    if cell_value not in filter_values:
-                        rows_to_delete.append(row_idx)
-                
-                # 如果所有行都要删除，保留一行数据避免工作表为空
-                if len(rows_to_delete) >= ws.max_row - 1:
-                    print(f"警告: 工作表 '{sheet_name}' 的筛选条件 '{column_name}' 将删除所有行，保留第一行数据")
-                    if 2 in rows_to_delete:
-                        rows_to_delete.remove(2)
-                
-                # 构建行映射关系
-                row_mapping = FormulaHelper.build_row_mapping_after_deletion(original_row_map, rows_to_delete)
-                sheet_row_mappings[sheet_name] = row_mapping
-                
-                # 删除不符合条件的行
-                for row_idx in sorted(rows_to_delete, reverse=True):
-                    ws.delete_rows(row_idx, 1)
-                
-                # 更新公式
-                FormulaHelper.update_formulas_in_sheet(ws, row_mapping)
+            self._batch_total = len(self.condition_groups)
+            self._batch_finished = 0
+            self._batch_files = []
+            self._batch_workers = []
             
-            # 处理跨工作表公式引用
-            self.status_label.setText(f'处理跨工作表公式引用...')
-            QApplication.processEvents()
+            max_workers = max(1, min(os.cpu_count() or 1, self._batch_total))
+            pool = QThreadPool.globalInstance()
+            pool.setMaxThreadCount(max_workers)
             
-            # 遍历所有工作表，处理跨表引用
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                try:
-                    for row in sheet.iter_rows():
-                        for cell in row:
-                            if cell.data_type == 'f':  # 如果单元格包含公式
-                                formula = cell.value
-                                if formula and isinstance(formula, str):
-                                    new_formula = formula
-                                    # 查找工作表引用，如"Sheet1!A1"
-                                    sheet_refs = re.findall(r'(\'?[^!]+\'?)!(\$?[A-Z]+\$?[0-9]+)', formula)
-                                    for ref_sheet, cell_ref in sheet_refs:
-                                        # 清除引号
-                                        clean_sheet_name = ref_sheet.strip("'")
-                                        # 如果引用的工作表有行映射
-                                        if clean_sheet_name in sheet_row_mappings:
-                                            # 解析引用
-                                            match = re.match(r'(\$?[A-Z]+)(\$?[0-9]+)', cell_ref)
-                                            if match:
-                                                col_ref, row_ref = match.groups()
-                                                
-                                                # 获取行号
-                                                if row_ref.startswith('$'):
-                                                    row_num = int(row_ref[1:])
-                                                    is_absolute = True
-                                                else:
-                                                    row_num = int(row_ref)
-                                                    is_absolute = False
-                                                
-                                                # 查找新行号
-                                                mapping = sheet_row_mappings[clean_sheet_name]
-                                                if row_num in mapping:
-                                                    new_row_num = mapping[row_num]
-                                                    
-                                                    if new_row_num is None:
-                                                        continue
-                                                    
-                                                    # 构建新引用
-                                                    if is_absolute:
-                                                        new_row_ref = f'${new_row_num}'
-                                                    else:
-                                                        new_row_ref = str(new_row_num)
-                                                    
-                                                    new_cell_ref = f'{col_ref}{new_row_ref}'
-                                                    
-                                                    # 替换引用
-                                                    original_ref = f'{ref_sheet}!{cell_ref}'
-                                                    replacement = f'{ref_sheet}!{new_cell_ref}'
-                                                    new_formula = new_formula.replace(original_ref, replacement)
-                                    
-                                    # 更新公式
-                                    if new_formula != formula:
-                                        try:
-                                            cell.value = new_formula
-                                        except Exception as e:
-                                            print(f"更新公式时出错: {e} - 原始公式: {formula}, 新公式: {new_formula}")
-                except Exception as e:
-                    print(f"处理工作表 '{sheet_name}' 的公式时出错: {str(e)}")
+            # 多个条件组时在进程池中并行处理；子进程使用spawn方式启动，避免fork带有Qt线程的进程
+            self._batch_executor = None
+            if max_workers > 1 and method != 'streaming':
+                self._batch_executor = ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
             
-            # 应用所有工作表的格式调整
-            for sheet_name in wb.sheetnames:
-                try:
-                    ws = wb[sheet_name]
-                    # 处理合并单元格
-                    if hasattr(ws, 'merged_cells') and ws.merged_cells:
-                        print(f"处理工作表 {sheet_name} 的合并单元格")
-                except Exception as e:
-                    print(f"处理工作表 '{sheet_name}' 的合并单元格时出错: {str(e)}")
+            if method == 'streaming':
+                workers = [StreamingWorker(self.excel_file, list(self.condition_groups), output_paths)]
+            else:
+                workers = [GroupWorker(self._batch_executor, self.excel_file, group, new_file_path,
+                                       method, df_dict, value_indices)
+                           for group, new_file_path in zip(self.condition_groups, output_paths)]
             
-            # 保存文件
-            try:
-                wb.save(output_path)
-                wb.close()
-            except PermissionError:
-                QMessageBox.critical(self, "错误", f"无法保存文件，可能是权限不足或文件被其他程序占用:\n{output_path}")
-                raise
+            for worker in workers:
+                worker.signals.status.connect(self.status_label.setText)
+                worker.signals.done.connect(self._batch_files.append)
+                worker.signals.error.connect(self.on_group_error)
+                worker.signals.finished.connect(self.on_group_finished)
+                # 保留信号对象的引用，直到所有条件组处理结束
+                self._batch_workers.append(worker.signals)
+                pool.start(worker)
             
-        except PermissionError:
-            QMessageBox.critical(self, "错误", f"无法写入文件，可能是权限不足或文件被其他程序占用:\n{output_path}")
-            raise
         except Exception as e:
             error_details = traceback.format_exc()
-            print(f"处理条件组时出错: {str(e)}\n{error_details}")
-            QMessageBox.critical(self, "错误", f"处理条件组时出错: {str(e)}")
-            raise
+            QMessageBox.critical(self, '错误', f'批量处理时出错: {str(e)}\n\n详细信息:\n{error_details}')
+            self.set_batch_running(False)
+            self.progress_bar.setVisible(False)
+            self.status_label.setText('')
     
-    def batch_process_with_pandas(self, condition_group, output_path):
-        """使用pandas方法处理条件组"""
-        try:
-            # 显示警告
-            QMessageBox.warning(self, '警告', 
-                f'由于Excel文件格式问题，将使用备用方法处理条件组 "{condition_group.name}"。\n'
-                f'注意：此方法将无法保留公式及其引用关系，只会保留当前计算结果。')
-            
-            # 读取所有工作表
-            all_dfs = {}
-            processed_sheets = []
-            skipped_sheets = []
-            
-            for sheet_name, df in self.df_dict.items():
-                try:
-                    # 创建副本以防止修改原始数据
-                    sheet_df = df.copy()
-                    
-                    # 应用条件组中的所有条件
-                    filters_applied = False
-                    for condition in condition_group.conditions:
-                        if condition['sheet'] == sheet_name:
-                            column = condition['column']
-                            values = [str(v) for v in condition['values']]  # 转换为字符串进行比较
-                            
-                            # 应用筛选
-                            if column in sheet_df.columns:
-                                # 将数据列转换为字符串以进行比较
-                                sheet_df = sheet_df[sheet_df[column].astype(str).isin(values)]
-                                filters_applied = True
-                                print(f"已为工作表 '{sheet_name}' 应用列 '{column}' 的筛选条件，筛选后行数: {len(sheet_df)}")
-                            else:
-                                print(f"警告: 在工作表 '{sheet_name}' 中找不到列 '{column}'，跳过此筛选条件")
-                    
-                    # 添加到结果字典
-                    all_dfs[sheet_name] = sheet_df
-                    if filters_applied:
-                        processed_sheets.append(sheet_name)
-                    else:
-                        print(f"工作表 '{sheet_name}' 没有应用任何筛选条件，保留所有行")
-                        
-                except Exception as e:
-                    print(f"处理工作表 '{sheet_name}' 时出错: {str(e)}")
-                    skipped_sheets.append(sheet_name)
-            
-            # 如果没有成功处理任何工作表，则报告错误
-            if not all_dfs:
-                raise Exception("无法处理任何工作表")
-            
-            # 将所有工作表写入新文件
-            try:
-                with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                    for sheet_name, sheet_df in all_dfs.items():
-                        # 如果筛选后的数据为空，添加一个标题行
-                        if len(sheet_df) == 0 and len(sheet_df.columns) > 0:
-                            print(f"警告: 工作表 '{sheet_name}' 筛选后没有数据，只保留标题行")
-                            # 创建一个只有标题的空DataFrame
-                            empty_df = pd.DataFrame(columns=sheet_df.columns)
-                            empty_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        else:
-                            sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
-            except Exception as e:
-                raise Exception(f"写入Excel文件时出错: {str(e)}")
-                    
-            # 生成处理报告
-            report_message = f"已使用备用方法处理文件 \"{os.path.basename(output_path)}\"。\n\n"
-            
-            if processed_sheets:
-                report_message += f"已应用筛选条件的工作表 ({len(processed_sheets)}):\n"
-                report_message += ", ".join(processed_sheets[:5])
-                if len(processed_sheets) > 5:
-                    report_message += f"... 等 {len(processed_sheets)} 个工作表\n\n"
-                else:
-                    report_message += "\n\n"
-            
-            if skipped_sheets:
-                report_message += f"处理失败的工作表 ({len(skipped_sheets)}):\n"
-                report_message += ", ".join(skipped_sheets)
-                report_message += "\n\n"
-            
-            report_message += "注意：某些复杂的格式可能未能完全保留。"
-            
-            # 提示用户可能丢失一些格式
-            QMessageBox.information(self, '信息', report_message)
+    def set_batch_running(self, running):
+        """处理期间禁止编辑条件组和条件，避免后台任务读取条件组时被同时修改"""
+        self.process_btn.setEnabled(not running)
+        self.groups_panel.setEnabled(not running)
+        self.conditions_panel.setEnabled(not running)
+    
+    def on_group_error(self, group_name, message):
+        """单个条件组处理失败"""
+        QMessageBox.warning(self, '警告', 
+                          f'处理条件组 "{group_name}" 时出错: {message}\n'
+                          f'将跳过此条件组并继续处理其他组。')
+    
+    def on_group_finished(self):
+        """单个条件组处理结束，全部结束后显示汇总信息"""
+        self._batch_finished += 1
+        self.progress_bar.setValue(self._batch_finished)
+        if self._batch_finished < self._batch_total:
+            return
+        
+        self._batch_workers = []
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+            self._batch_executor = None
+        self.set_batch_running(False)
+        self.progress_bar.setVisible(False)
+        
+        # 完成处理
+        processed_files = self._batch_files
+        if processed_files:
+            self.status_label.setText('批量处理完成!')
+            result_message = f'已成功生成 {len(processed_files)} 个文件:\n\n'
+            result_message += '\n'.join(processed_files[:10])
+            if len(processed_files) > 10:
+                result_message += f'\n... 等总共 {len(processed_files)} 个文件'
+            result_message += f'\n\n所有文件已保存在:\n{self._batch_file_dir}'
             
-        except PermissionError:
-            QMessageBox.critical(self, "错误", f"无法写入文件，可能是权限不足或文件被其他程序占用:\n{output_path}")
-            raise
-        except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"使用pandas处理条件组时出错: {str(e)}\n{error_details}")
-            QMessageBox.critical(self, "错误", f"使用pandas处理条件组时出错: {str(e)}")
-            raise
+            QMessageBox.information(self, '成功', result_message)
+        else:
+            QMessageBox.warning(self, '警告', '处理过程完成，但没有生成任何文件。')
+        self.status_label.setText('')
     
     def import_condition_groups(self):
         """导入条件组"""
@@ -1249,15 +2147,33 @@ class BatchProcessingWidget(QWidget):
         
         if not file_path:
             return
-            
+        
+        # 在后台线程中读取并解析JSON文件，完成后回到界面线程校验和更新
+        self.start_json_worker(JSONIOWorker(file_path), self.on_groups_loaded)
+    
+    def start_json_worker(self, worker, on_success):
+        """启动条件组文件读写线程，完成前禁用导入导出按钮"""
+        self.import_groups_btn.setEnabled(False)
+        self.export_groups_btn.setEnabled(False)
+        worker.finished_ok.connect(on_success)
+        worker.finished_err.connect(self.on_json_io_error)
+        worker.finished.connect(self.on_json_worker_finished)
+        self._json_worker = worker  # 保留引用，避免线程运行中被回收
+        worker.start()
+    
+    def on_json_worker_finished(self):
+        """条件组文件读写线程结束"""
+        self._json_worker = None
+        self.import_groups_btn.setEnabled(True)
+        self.export_groups_btn.setEnabled(True)
+    
+    def on_json_io_error(self, message):
+        """条件组文件读写失败"""
+        QMessageBox.critical(self, '错误', message)
+    
+    def on_groups_loaded(self, data):
+        """校验导入的条件组数据并更新界面"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError as e:
-                    QMessageBox.critical(self, '错误', f'无效的JSON文件格式: {str(e)}')
-                    return
-                
             if not isinstance(data, list):
                 QMessageBox.warning(self, '警告', '无效的条件组文件格式，应为条件组列表')
                 return
@@ -1321,10 +2237,6 @@ class BatchProcessingWidget(QWidget):
                 success_msg += f'，跳过了 {skipped_groups} 个无效条件组'
             QMessageBox.information(self, '成功', success_msg)
             
-        except FileNotFoundError:
-            QMessageBox.critical(self, '错误', f'找不到文件: {file_path}')
-        except PermissionError:
-            QMessageBox.critical(self, '错误', f'无法读取文件，可能是权限不足: {file_path}')
         except Exception as e:
             error_details = traceback.format_exc()
             print(f"导入条件组时出错: {str(e)}\n{error_details}")
@@ -1346,58 +2258,25 @@ class BatchProcessingWidget(QWidget):
         if not file_path.lower().endswith('.json'):
             file_path += '.json'
             
-        try:
-            # 将条件组转换为可序列化的字典
-            groups_data = []
-            for group in self.condition_groups:
-                # 确保条件组有有效的名称和条件
-                if not hasattr(group, 'name') or not hasattr(group, 'conditions'):
-                    print(f"跳过无效的条件组: {group}")
-                    continue
-                    
-                group_data = {
-                    'name': group.name,
-                    'conditions': group.conditions
-                }
-                groups_data.append(group_data)
-            
-            if not groups_data:
-                QMessageBox.warning(self, '警告', '没有有效的条件组可以导出')
-                return
-                
-            # 写入JSON文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(groups_data, f, ensure_ascii=False, indent=2)
+        # 将条件组转换为可序列化的字典
+        groups_data = []
+        for group in self.condition_groups:
+            # 确保条件组有有效的名称和条件
+            if not hasattr(group, 'name') or not hasattr(group, 'conditions'):
+                print(f"跳过无效的条件组: {group}")
+                continue
                 
-            QMessageBox.information(self, '成功', f'已成功导出 {len(groups_data)} 个条件组到文件:\n{file_path}')
-            
-        except PermissionError:
-            QMessageBox.critical(self, '错误', f'无法写入文件，可能是权限不足或文件被其他程序占用:\n{file_path}')
-        except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"导出条件组时出错: {str(e)}\n{error_details}")
-            QMessageBox.critical(self, '错误', f'导出条件组时出错: {str(e)}\n\n详细信息:\n{error_details}')
-
-    def copy_cell_format(self, source_cell, target_cell):
-        """完整复制单元格格式"""
-        if source_cell.has_style:
-            target_cell.font = copy(source_cell.font)
-            target_cell.border = copy(source_cell.border)
-            target_cell.fill = copy(source_cell.fill)
-            target_cell.number_format = source_cell.number_format
-            target_cell.protection = copy(source_cell.protection)
-            target_cell.alignment = copy(source_cell.alignment)
-    
-    def copy_sheet_formatting(self, source_sheet, target_sheet):
-        """复制工作表级别的格式设置"""
-        # 复制列宽
-        for column_letter, column_dim in source_sheet.column_dimensions.items():
-            target_sheet.column_dimensions[column_letter].width = column_dim.width
+            groups_data.append(group.to_dict())
         
-        # 复制行高
-        for row_number, row_dim in source_sheet.row_dimensions.items():
-            if row_dim.height is not None:
-                target_sheet.row_dimensions[row_number].height = row_dim.height
+        if not groups_data:
+            QMessageBox.warning(self, '警告', '没有有效的条件组可以导出')
+            return
+        
+        # 在后台线程中序列化并写入JSON文件
+        self.start_json_worker(
+            JSONIOWorker(file_path, groups_data),
+            lambda _: QMessageBox.information(
+                self, '成功', f'已成功导出 {len(groups_data)} 个条件组到文件:\n{file_path}'))
 
 class ExcelSplitterApp(QMainWindow):
     def __init__(self):
@@ -1430,6 +2309,7 @@ class ExcelSplitterApp(QMainWindow):
                  (screen.height() - size.height()) // 2)
 
 def main():
+    multiprocessing.freeze_support()  # 打包为exe后子进程需要
     app = QApplication(sys.argv)
     window = ExcelSplitterApp()
     window.show()